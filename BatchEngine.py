@@ -0,0 +1,429 @@
+import random
+import numpy as np
+from tqdm import tqdm
+from Channel import LOSS_POLICIES, assign_channels
+
+# 与Receiver的状态编号、计划窗口保持一致
+from Receiver import (
+    DWELL,
+    SWITCH,
+    SCHEDULE,
+    SWITCH_TO_SCHEDULE,
+    SCHEDULE_WINDOW,
+    SCHEDULE_EXPIRE,
+)
+
+# 支持的仿真模式 -> 每个接收机的(是否轮询驻留, 是否扫描计划发送者, 是否仅调度)
+BATCH_MODES = {
+    "R1-Rn-polling": lambda i: (True, False, False),
+    "R1-Rn-both-scheduling-and-polling": lambda i: (True, True, False),
+    "R1-polling-R2-scheduling": lambda i: (
+        (True, False, False) if i == 0 else (False, True, True)
+    ),
+}
+
+# 没有计时的状态（仅调度接收机空闲时）的截止时间步
+NO_DEADLINE = np.iinfo(np.int64).max // 2
+
+
+class BatchSimulator:
+    """
+    用NumPy数组同时仿真R个相互独立的副本，每个副本与
+    Simulator(num_senders, seed=seeds[r])逐毫秒运行的结果完全一致
+    各副本只在自己的事件时间步上计算，空闲时间步直接跳过
+    """
+
+    def __init__(
+        self,
+        num_senders,
+        seeds,
+        sim_mode="R1-Rn-both-scheduling-and-polling",
+        num_channels=40,
+        num_receivers=2,
+        channel_switch_time=5,
+        channel_dwell_time=220,
+        interval=200,
+        loss_policy="DROP_ONE",
+        channel_assignment=None,
+    ):
+        if sim_mode not in BATCH_MODES:
+            raise ValueError(f"Sim mode {sim_mode} is not supported by BatchSimulator")
+        if loss_policy not in LOSS_POLICIES:
+            raise ValueError(f"Unknown loss policy {loss_policy}")
+        self.cur_timestep = 0  # ms
+        self.sim_mode = sim_mode
+        self.seeds = list(seeds)
+        self.num_replicas = R = len(self.seeds)
+        self.num_senders = S = num_senders
+        self.num_channels = C = num_channels
+        self.num_receivers = K = num_receivers
+
+        self.switch_time = channel_switch_time
+        self.expected_dwell_time = channel_dwell_time
+        self.max_schedule_timeout = channel_dwell_time
+
+        # 发送者：按Simulator相同的随机数调用顺序生成信道与初始相位
+        self.interval = interval
+        self.sender_ch = np.zeros((R, S), dtype=np.int64)
+        self.sender_last = np.zeros((R, S), dtype=np.int64)
+        for r, seed in enumerate(self.seeds):
+            rng = random.Random(seed)
+            for i in range(S):
+                self.sender_ch[r, i] = rng.randint(0, C - 1)
+                self.sender_last[r, i] = rng.randint(0, self.interval)
+
+        # 信道：每个(副本, 信道)一个环形队列，元素为发送者编号
+        self.queue_size = max(S, 1)
+        self.queue = np.zeros((R, C, self.queue_size), dtype=np.int64)
+        self.queue_head = np.zeros((R, C), dtype=np.int64)
+        self.queue_len = np.zeros((R, C), dtype=np.int64)
+        # 正在监听的接收机位掩码，多个接收机可能同时驻留同一信道（与Channel.listeners相同）
+        self.listening = np.zeros((R, C), dtype=np.int64)
+        self.drop_all = loss_policy == "DROP_ALL"
+        self.packet_sended = np.zeros((R, C), dtype=np.int64)
+        self.packet_recved = np.zeros((R, C), dtype=np.int64)
+        self.packet_losted = np.zeros((R, C), dtype=np.int64)
+
+        # 接收机：管理的信道（组内序号 -> 信道编号）与行为模式，分配方式与Simulator相同
+        if channel_assignment is None:
+            channel_assignment = (
+                "CONTIGUOUS" if sim_mode == "R1-Rn-both-scheduling-and-polling" else "ALL"
+            )
+        if channel_assignment != "ALL" and sim_mode == "R1-polling-R2-scheduling":
+            raise ValueError(f"{sim_mode} requires channel_assignment='ALL'")
+        self.channel_assignment = channel_assignment
+        self.ch_ids = [
+            np.array(group, dtype=np.int64)
+            for group in assign_channels(C, K, channel_assignment)
+        ]
+        if not all(len(ids) for ids in self.ch_ids):
+            raise ValueError("Every receiver needs at least one channel")
+        self.modes = [BATCH_MODES[sim_mode](i) for i in range(K)]
+        self.state = np.full((K, R), DWELL, dtype=np.int64)
+        self.poll_channel_idx = np.zeros((K, R), dtype=np.int64)
+        self.active_channel_idx = np.zeros((K, R), dtype=np.int64)
+        # 与Receiver相同用截止时间步计时：当前状态在deadline时间步结束，
+        # 驻留被计划接收打断时剩余的驻留时间保存在dwell_left
+        self.dwell_left = np.full((K, R), channel_dwell_time, dtype=np.int64)
+        self.deadline = np.array(
+            [[channel_dwell_time if m[0] else NO_DEADLINE] * R for m in self.modes],
+            dtype=np.int64,
+        )
+        self.schedule_timeout_counter = np.zeros((K, R), dtype=np.int64)
+        # 扫描计划发送者会产生效果的最早时间步，由_next_event更新，之前的扫描可以省略
+        self.scan_at = np.zeros((K, R), dtype=np.int64)
+
+        # 发送者信息表：一个轮询一个调度时两个接收机共享同一张表
+        shared = sim_mode == "R1-polling-R2-scheduling"
+        self.info_group = [0 if shared else i for i in range(K)]
+        G = 1 if shared else K
+        self.info_seen = np.zeros((G, R, S), dtype=bool)
+        self.info_order = np.zeros((G, R, S), dtype=np.int64)  # 字典插入顺序
+        self.info_counter = np.zeros((G, R), dtype=np.int64)
+        self.info_channel = np.zeros((G, R, S), dtype=np.int64)
+        self.info_last = np.zeros((G, R, S), dtype=np.int64)
+        self.info_send_times = np.zeros((G, R, S), dtype=np.int64)
+        self.info_next = np.full((G, R, S), -1, dtype=np.int64)
+        self.info_min = np.full((G, R, S), 3600000, dtype=np.int64)
+
+    def _pop(self, rows, ch):
+        sender = self.queue[rows, ch, self.queue_head[rows, ch]]
+        self.queue_head[rows, ch] = (self.queue_head[rows, ch] + 1) % self.queue_size
+        self.queue_len[rows, ch] -= 1
+        return sender
+
+    def _senders_send(self, rows, t):
+        # rows为本轮推进的副本，t为各副本当前处理的时间步
+        due_r, senders = np.nonzero(
+            t[rows, None] - self.sender_last[rows] > self.interval
+        )
+        if due_r.size == 0:
+            return
+        rows = rows[due_r]
+        ch = self.sender_ch[rows, senders]
+        # 同一时间步同一信道按发送者编号顺序入队，与逐个调用packet_send一致
+        key = rows * self.num_channels + ch
+        if key.size > 1 and (key[1:] == key[:-1]).any():
+            # nonzero按行、发送者编号顺序返回，只有同一信道有多个包时才需要计算排队位置
+            order = np.argsort(key, kind="stable")
+            rows, senders, ch, key = rows[order], senders[order], ch[order], key[order]
+            new = np.empty(key.size, dtype=bool)
+            new[0] = True
+            np.not_equal(key[1:], key[:-1], out=new[1:])
+            group_start = np.flatnonzero(new)
+            rank = np.arange(key.size) - group_start[np.cumsum(new) - 1]
+        else:
+            rank = 0
+        qlen = self.queue_len[rows, ch]
+        if (qlen + rank >= self.queue_size).any():
+            raise RuntimeError("Channel queue overflow.")
+        tail = (self.queue_head[rows, ch] + qlen + rank) % self.queue_size
+        self.queue[rows, ch, tail] = senders
+        np.add.at(self.queue_len, (rows, ch), 1)
+        np.add.at(self.packet_sended, (rows, ch), 1)
+        self.sender_last[rows, senders] = t[rows]
+
+    def _record_sender_info(self, k, rows, senders, t) -> np.ndarray:
+        # 对应Receiver.record_sender_info，返回每行是否为首次收到该发送者
+        g = self.info_group[k]
+        t = t[rows]
+        first = ~self.info_seen[g, rows, senders]
+        if first.any():
+            fr, fs = rows[first], senders[first]
+            self.info_seen[g, fr, fs] = True
+            self.info_order[g, fr, fs] = self.info_counter[g, fr]
+            self.info_counter[g, fr] += 1
+            self.info_channel[g, fr, fs] = self.poll_channel_idx[k, fr]
+            self.info_last[g, fr, fs] = t[first]
+            self.info_send_times[g, fr, fs] = 1
+            self.info_next[g, fr, fs] = -1
+            self.info_min[g, fr, fs] = 3600000
+            later = ~first
+            ur, us, t = rows[later], senders[later], t[later]
+        else:
+            ur, us = rows, senders
+        min_interval = np.minimum(self.info_min[g, ur, us], t - self.info_last[g, ur, us])
+        self.info_min[g, ur, us] = min_interval
+        self.info_last[g, ur, us] = t
+        self.info_send_times[g, ur, us] += 1
+        # 下次接收时间延展到1s以上
+        multiple = np.maximum(1, -(-1000 // min_interval))
+        self.info_next[g, ur, us] = t + multiple * min_interval
+        if (multiple * min_interval > SCHEDULE_EXPIRE).any():
+            # 本时间步后面的扫描要删除该发送者
+            self.scan_at[:, ur] = 0
+        return first
+
+    def _schedule_scan(self, k, rows, t):
+        # 对应packet_recv/packet_schedule_recv中DWELL状态下的计划扫描
+        if rows.size == 0:
+            return
+        g = self.info_group[k]
+        t_rows = t[rows]
+        t = t_rows[:, None]
+        nxt = self.info_next[g, rows]
+        # 没有收到过或已删除的发送者info_next为-1
+        scheduled = nxt > 0
+        missed = scheduled & (nxt < t)
+        if missed.any():
+            nxt = np.where(missed, t + self.info_min[g, rows], nxt)
+            self.info_next[g, rows] = nxt
+        diff = nxt - t
+        expired = scheduled & (diff > SCHEDULE_EXPIRE)
+        if expired.any():
+            self.info_seen[g, rows] &= ~expired
+            self.info_next[g, rows] = np.where(expired, -1, nxt)
+            scheduled &= ~expired
+        candidate = scheduled & (diff > 0) & (diff < SCHEDULE_WINDOW)
+        hit = candidate.any(axis=1)
+        if not hit.any():
+            return
+        hit_rows = rows[hit]
+        # 间隔相同时取字典中先插入的发送者
+        key = np.where(
+            candidate[hit],
+            diff[hit] * (1 << 32) + self.info_order[g, hit_rows],
+            NO_DEADLINE,
+        )
+        winner = key.argmin(axis=1)
+        target = self.info_channel[g, hit_rows, winner]
+        # 暂停驻留计时；仅调度接收机的新状态从下一时间步开始处理
+        first = t_rows[hit] + (1 if self.modes[k][2] else 0)
+        self.dwell_left[k, hit_rows] = self.deadline[k, hit_rows] - t_rows[hit]
+        switch = target != self.poll_channel_idx[k, hit_rows]
+        sr = hit_rows[switch]
+        self.listening[sr, self.ch_ids[k][self.active_channel_idx[k, sr]]] &= ~(1 << k)
+        self.active_channel_idx[k, sr] = target[switch]
+        self._enter(k, sr, SWITCH_TO_SCHEDULE, first[switch])
+        self._enter(k, hit_rows[~switch], SCHEDULE, first[~switch])
+
+    def _enter(self, k, rows, state, first):
+        # 对应Receiver._enter，first为新状态第一次被处理的时间步
+        if rows.size == 0:
+            return
+        self.state[k, rows] = state
+        if state == DWELL:
+            if self.modes[k][0]:
+                self.deadline[k, rows] = first + self.dwell_left[k, rows]
+            else:
+                self.deadline[k, rows] = NO_DEADLINE
+        elif state == SCHEDULE:
+            self.deadline[k, rows] = first + self.max_schedule_timeout
+        else:
+            self.deadline[k, rows] = first + self.switch_time
+
+    def _leave_schedule(self, k, rows, t):
+        first = t[rows] + 1
+        if self.modes[k][2]:
+            self._enter(k, rows, DWELL, first)
+        else:
+            back = self.poll_channel_idx[k, rows] != self.active_channel_idx[k, rows]
+            self._enter(k, rows[back], SWITCH, first[back])
+            self._enter(k, rows[~back], DWELL, first[~back])
+
+    def _recv_step(self, k, rows, t):
+        polling, scheduling, schedule_only = self.modes[k]
+        ids = self.ch_ids[k]
+        mask = 1 << k
+        dwell = self.state[k, rows] == DWELL
+        if scheduling:
+            self._schedule_scan(k, rows[dwell & (self.scan_at[k, rows] <= t[rows])], t)
+        # 扫描之后的状态（副本），packet_recv中新状态在本时间步就开始处理
+        state = self.state[k, rows]
+        if schedule_only:
+            # packet_schedule_recv中扫描与后续分支是同一个if/elif链
+            state[dwell] = -1
+
+        for from_state, to_state in ((SWITCH, DWELL), (SWITCH_TO_SCHEDULE, SCHEDULE)):
+            sel = rows[state == from_state]
+            if sel.size:
+                done = sel[t[sel] >= self.deadline[k, sel]]
+                if done.size:
+                    self._enter(k, done, to_state, t[done] + 1)
+
+        sel = rows[state == SCHEDULE]
+        if sel.size:
+            ch = ids[self.active_channel_idx[k, sel]]
+            self.listening[sel, ch] |= mask
+            counting = t[sel] < self.deadline[k, sel]
+            has = counting & (self.queue_len[sel, ch] > 0)
+            if has.any():
+                hr, hch = sel[has], ch[has]
+                senders = self._pop(hr, hch)
+                self.packet_recved[hr, hch] += 1
+                self._record_sender_info(k, hr, senders, t)
+                self.listening[hr, hch] &= ~mask
+                if schedule_only:
+                    self.schedule_timeout_counter[k, hr] += 1
+                self._leave_schedule(k, hr, t)
+            if not counting.all():
+                tr = sel[~counting]
+                self.listening[tr, ch[~counting]] &= ~mask
+                self.schedule_timeout_counter[k, tr] += 1
+                self._leave_schedule(k, tr, t)
+
+        if not polling:
+            return
+        sel = rows[state == DWELL]
+        if sel.size:
+            poll = self.poll_channel_idx[k, sel]
+            self.active_channel_idx[k, sel] = poll
+            ch = ids[poll]
+            self.listening[sel, ch] |= mask
+            counting = t[sel] < self.deadline[k, sel]
+            has = counting & (self.queue_len[sel, ch] > 0)
+            if has.any():
+                hr, hch = sel[has], ch[has]
+                senders = self._pop(hr, hch)
+                self.packet_recved[hr, hch] += 1
+                # 第一次收到该发送者的包，重置停留时间等待下一次发包
+                fr = hr[self._record_sender_info(k, hr, senders, t)]
+                self.deadline[k, fr] = t[fr] + 1 + self.expected_dwell_time
+            if not counting.all():
+                tr = sel[~counting]
+                self.listening[tr, ch[~counting]] &= ~mask
+                self.dwell_left[k, tr] = self.expected_dwell_time
+                next_poll = (poll[~counting] + 1) % len(ids)
+                self.poll_channel_idx[k, tr] = next_poll
+                moved = next_poll != poll[~counting]
+                self._enter(k, tr[moved], SWITCH, t[tr[moved]] + 1)
+                self._enter(k, tr[~moved], DWELL, t[tr[~moved]] + 1)
+
+    def _all_channel_lost(self, rows):
+        lost = (self.listening[rows] == 0) & (self.queue_len[rows] > 0)
+        if lost.any():
+            r, ch = np.nonzero(lost)
+            r = rows[r]
+            if self.drop_all:
+                self.packet_losted[r, ch] += self.queue_len[r, ch]
+                self.queue_len[r, ch] = 0
+            else:
+                self._pop(r, ch)
+                self.packet_losted[r, ch] += 1
+
+    def _next_event(self, cur) -> np.ndarray:
+        """
+        各副本从cur（含）起下一个必须处理的时间步：有发送、信道里还有包、
+        当前状态到截止时间步，或计划发送者进入20ms窗口（以及错过、过期需要更新）
+        之间的时间步里什么都不会发生，计时都用截止时间步表示，跳过时不需要补算
+        """
+        nxt = self.sender_last.min(axis=1) + (self.interval + 1)
+        np.minimum(nxt, self.deadline.min(axis=0), out=nxt)
+        nxt[self.queue_len.any(axis=1)] = 0
+        for k, (polling, scheduling, _) in enumerate(self.modes):
+            if not scheduling:
+                continue
+            info_next = self.info_next[self.info_group[k]]
+            soonest = np.where(info_next > 0, info_next, NO_DEADLINE).min(axis=1)
+            scan = soonest - (SCHEDULE_WINDOW - 1)
+            # 一小时以后的计划在下一次扫描时删除
+            scan[info_next.max(axis=1) - cur > SCHEDULE_EXPIRE] = 0
+            self.scan_at[k] = scan
+            if polling:
+                # 切换后第一次驻留时才同步活动信道，在此之前扫描到的计划包仍按旧信道接收
+                scan = np.where(
+                    self.active_channel_idx[k] != self.poll_channel_idx[k], 0, scan
+                )
+            np.minimum(nxt, np.where(self.state[k] == DWELL, scan, NO_DEADLINE), out=nxt)
+        return np.maximum(nxt, cur)
+
+    def run(self, step_limit, progress=True):
+        """
+        事件驱动地推进所有副本：每轮各副本跳到自己的下一个事件时间步并处理该时间步，
+        空闲时间步不逐个计算，结果与逐毫秒推进完全一致
+        """
+        if progress:
+            pbar = tqdm(
+                total=step_limit,
+                initial=self.cur_timestep,
+                desc=f"BatchSim(senders={self.num_senders}, replicas={self.num_replicas})",
+            )
+        cur = np.full(self.num_replicas, self.cur_timestep, dtype=np.int64)
+        while self.cur_timestep < step_limit:
+            t = np.minimum(self._next_event(cur), step_limit)
+            rows = np.flatnonzero(t < step_limit)
+            if rows.size:
+                self._senders_send(rows, t)
+                for k in range(self.num_receivers):
+                    self._recv_step(k, rows, t)
+                self._all_channel_lost(rows)
+            cur = np.minimum(t + 1, step_limit)
+            done = int(cur.min())
+            if progress:
+                pbar.update(done - self.cur_timestep)
+            self.cur_timestep = done
+        if progress:
+            pbar.close()
+
+    def totals(self) -> np.ndarray:
+        """
+        每个副本一行：[total_packets, received, lost, lost_rate(%)]
+        """
+        received = self.packet_recved.sum(axis=1)
+        losted = self.packet_losted.sum(axis=1)
+        total_packets = received + losted
+        lost_rate = np.divide(
+            losted * 100.0,
+            total_packets,
+            out=np.zeros(self.num_replicas),
+            where=total_packets > 0,
+        )
+        return np.column_stack([total_packets, received, losted, lost_rate])
+
+    def result_rows(self) -> list:
+        # 与Simulator.result_row格式相同，每个副本一行，不分批统计、不记录延迟，相应列为空
+        return [
+            [
+                self.num_senders,
+                int(total),
+                int(recv),
+                int(lost),
+                f"{rate:.2f}%",
+                self.cur_timestep,
+                "",
+                "",
+                "",
+                "",
+            ]
+            for total, recv, lost, rate in self.totals()
+        ]
@@ -0,0 +1,165 @@
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows没有resource模块，不统计峰值内存
+    resource = None
+
+SIM_MODES = [
+    "R1-Rn-polling",
+    "R1-polling-R2-scheduling",
+    "R1-polling-R2-limited-polling",
+    "R1-polling-R2-weighted-polling",
+    "R1-Rn-both-scheduling-and-polling",
+]
+SENDER_COUNTS = [1, 15, 40, 1000]
+ENGINES = ["EVENT", "TICK"]
+
+
+def case_key(case: dict) -> str:
+    return f"{case['mode']}|{case['engine']}|{case['num_senders']}"
+
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS返回字节，Linux返回KB
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def run_case(mode, engine, num_senders, steps, record_mode, seed) -> dict:
+    # 在独立进程中运行，峰值内存只反映本次仿真
+    import Simulator
+
+    Simulator.cur_sim_mode = mode
+    Simulator.SIM_ENGINE = engine
+    sim = Simulator.Simulator(
+        num_senders=num_senders, seed=seed, record_mode=record_mode
+    )
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    start = time.perf_counter()
+    sim.run(step_limit=steps, progress=False)
+    elapsed = time.perf_counter() - start
+    blocks_after = sys.getallocatedblocks()
+    packets = sum(ch.packet_sended for ch in sim.channels.channels)
+    return {
+        "mode": mode,
+        "engine": engine,
+        "num_senders": num_senders,
+        "steps": steps,
+        "seconds": elapsed,
+        "ticks_per_sec": steps / elapsed,
+        "packets_per_sec": packets / elapsed,
+        "peak_rss_kb": peak_rss_kb(),
+        # 运行前后存活内存块数之差，反映逐时间步留存的分配
+        "net_blocks_per_tick": (blocks_after - blocks_before) / steps,
+    }
+
+
+def run_benchmarks(
+    modes=SIM_MODES,
+    engines=ENGINES,
+    sender_counts=SENDER_COUNTS,
+    steps=20000,
+    record_mode="OFF",
+    seed=0,
+) -> dict:
+    cases = [
+        (mode, engine, n, steps, record_mode, seed)
+        for mode in modes
+        for engine in engines
+        for n in sender_counts
+    ]
+    results = []
+    # 每个用例一个新进程，顺序执行避免互相抢占CPU
+    with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as executor:
+        for result in executor.map(run_case, *zip(*cases)):
+            print(
+                f"{case_key(result):<55} {result['ticks_per_sec']:>12.0f} ticks/s"
+                f" {result['packets_per_sec']:>10.0f} packets/s"
+            )
+            results.append(result)
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "steps": steps,
+            "record_mode": record_mode,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare_with_baseline(report: dict, baseline: dict, threshold=0.2) -> list:
+    """
+    返回ticks_per_sec比基线下降超过threshold的用例
+    """
+    base = {case_key(r): r for r in baseline["results"]}
+    regressions = []
+    for r in report["results"]:
+        b = base.get(case_key(r))
+        if b is None:
+            continue
+        ratio = r["ticks_per_sec"] / b["ticks_per_sec"]
+        if ratio < 1 - threshold:
+            regressions.append((case_key(r), b["ticks_per_sec"], r["ticks_per_sec"], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulator benchmark suite")
+    parser.add_argument("--steps", type=int, default=20000)
+    parser.add_argument("--modes", nargs="+", default=SIM_MODES)
+    parser.add_argument("--engines", nargs="+", default=ENGINES)
+    parser.add_argument("--senders", nargs="+", type=int, default=SENDER_COUNTS)
+    parser.add_argument("--record-mode", default="OFF")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_result.json")
+    parser.add_argument("--baseline", default="bench_baseline.json")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="write results as the new baseline"
+    )
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(
+        modes=args.modes,
+        engines=args.engines,
+        sender_counts=args.senders,
+        steps=args.steps,
+        record_mode=args.record_mode,
+        seed=args.seed,
+    )
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    try:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f"No baseline at {args.baseline}, skipping comparison")
+        return 0
+    regressions = compare_with_baseline(report, baseline, args.threshold)
+    for key, before, after, ratio in regressions:
+        print(f"REGRESSION {key}: {before:.0f} -> {after:.0f} ticks/s ({ratio:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,47 +1,209 @@
+from collections import deque
 from Packet import Packet
+from Histogram import LogHistogram
+from Tracer import tracer, TraceEvent
+
+# 丢包策略：信道未被监听时，每个时间步
+#   "DROP_ONE": 只丢弃队首的一个包（原有行为，同一时刻到达的多个包逐毫秒依次丢弃）
+#   "DROP_ALL": 丢弃队列中全部的包
+LOSS_POLICIES = ("DROP_ONE", "DROP_ALL")
+
+# 信道分配给接收机的方式
+#   "ALL": 每个接收机管理全部信道
+#   "CONTIGUOUS": 按编号连续分块
+#   "INTERLEAVED": 接收机i管理编号 i, i+R, i+2R, ...
+#   "OVERLAPPING": 连续分块，每块再延伸到下一块，每个信道由相邻两个接收机管理
+CHANNEL_ASSIGNMENTS = ("ALL", "CONTIGUOUS", "INTERLEAVED", "OVERLAPPING")
 
 
 class Channel:
-    def __init__(self, index):
-        self.packets: list[Packet] = []
-        self.listening: bool = False
+    __slots__ = (
+        "packets",
+        "listeners",
+        "channel_index",
+        "packet_sended",
+        "packet_recved",
+        "packet_losted",
+        "busy",
+        "lossy",
+        "recv_latency",
+        "loss_age",
+    )
+
+    def __init__(self, index, busy: set = None, lossy: set = None):
+        # 第一次有包到达时才分配队列
+        self.packets: deque[Packet] | None = None
+        # 正在监听的接收机位掩码，多个接收机可以同时监听同一信道
+        self.listeners = 0
         self.channel_index = index
         self.packet_sended = 0
         self.packet_recved = 0
         self.packet_losted = 0
+        # 接收延迟 / 丢弃时包已滞留的时间，第一次用到时才创建
+        self.recv_latency: LogHistogram | None = None
+        self.loss_age: LogHistogram | None = None
+        # 由Channels增量维护：有包的信道 / 有包且未被监听的信道
+        self.busy = set() if busy is None else busy
+        self.lossy = set() if lossy is None else lossy
+
+    @property
+    def listening(self) -> bool:
+        return self.listeners != 0
 
-    def listen(self):
-        self.listening = True
+    def listen(self, mask=1):
+        if not self.listeners & mask:
+            self.listeners |= mask
+            self.lossy.discard(self)
 
-    def quit_listen(self):
-        self.listening = False
+    def quit_listen(self, mask=1):
+        if self.listeners & mask:
+            self.listeners &= ~mask
+            if not self.listeners and self.packets:
+                self.lossy.add(self)
 
     def packet_append(self, p: Packet):
+        if not self.packets:
+            if self.packets is None:
+                self.packets = deque()
+            self.busy.add(self)
+            if not self.listeners:
+                self.lossy.add(self)
         self.packets.append(p)
         self.packet_sended += 1
 
+    def record_latency(self, latency):
+        if self.recv_latency is None:
+            self.recv_latency = LogHistogram()
+        self.recv_latency.record(latency)
+
+    def _drained(self):
+        self.busy.discard(self)
+        self.lossy.discard(self)
+
     def packet_pop(self):
         if self.packets:
             self.packet_recved += 1
-            return self.packets.pop(0)
+            p = self.packets.popleft()
+            if not self.packets:
+                self._drained()
+            return p
         return None
 
-    def packet_lost(self):
-        for p in self.packets:
-            self.packet_losted += 1
-            return self.packets.pop(0)
+    def packet_lost(self, drop_all=False, timestep=-1) -> int:
+        # 返回本次丢弃的包数
+        if not self.packets:
+            return 0
+        if tracer.enabled:
+            for p in list(self.packets)[: None if drop_all else 1]:
+                tracer.emit(
+                    timestep,
+                    TraceEvent.LOST,
+                    channel=self.channel_index,
+                    sender=p.packet_id,
+                )
+        if self.loss_age is None:
+            self.loss_age = LogHistogram()
+        record = self.loss_age.record if timestep >= 0 else None
+        if drop_all:
+            dropped = len(self.packets)
+            if record:
+                for p in self.packets:
+                    if p.timestep >= 0:
+                        record(timestep - p.timestep)
+            self.packets.clear()
+        else:
+            dropped = 1
+            p = self.packets.popleft()
+            if record and p.timestep >= 0:
+                record(timestep - p.timestep)
+        self.packet_losted += dropped
+        if not self.packets:
+            self._drained()
+        return dropped
 
 
 class Channels:
-    def __init__(self, num_channels=40):
-        self.channels: list[Channel] = [Channel(i) for i in range(num_channels)]
+    """
+    稀疏信道表：信道对象在第一次被发送者或接收机用到时才创建，
+    从未用到的信道不占内存，每个时间步只处理busy/lossy中的信道
+    """
+
+    def __init__(self, num_channels=40, loss_policy="DROP_ONE"):
+        if loss_policy not in LOSS_POLICIES:
+            raise ValueError(f"Unknown loss policy {loss_policy}")
+        self.num_channels = num_channels
+        self.loss_policy = loss_policy
+        self.busy: set[Channel] = set()
+        self.lossy: set[Channel] = set()
+        self._channels: dict[int, Channel] = {}
+
+    def __len__(self):
+        return self.num_channels
+
+    @property
+    def channels(self) -> list[Channel]:
+        # 已创建的信道，按编号排序；未创建的信道收发丢包数都是0
+        return [self._channels[i] for i in sorted(self._channels)]
+
+    def all_channel_lost(self, timestep=-1):
+        # 只遍历有包且未被监听的信道
+        if self.lossy:
+            drop_all = self.loss_policy == "DROP_ALL"
+            for ch in list(self.lossy):
+                ch.packet_lost(drop_all, timestep)
+
+    def get_ch(self, channel_index) -> Channel:
+        ch = self._channels.get(channel_index)
+        if ch is None:
+            if not 0 <= channel_index < self.num_channels:
+                raise IndexError(f"Channel index {channel_index} out of range")
+            ch = Channel(channel_index, self.busy, self.lossy)
+            self._channels[channel_index] = ch
+        return ch
+
+
+class ChannelGroup:
+    """
+    一个接收机管理的信道子集，按组内序号访问，信道对象按需从Channels取得
+    """
+
+    __slots__ = ("channels", "ids", "_cache")
+
+    def __init__(self, channels: Channels, ids):
+        self.channels = channels
+        self.ids = ids  # 组内序号 -> 信道编号
+        self._cache: list[Channel | None] = [None] * len(ids)
+
+    def __len__(self):
+        return len(self.ids)
 
-    def all_channel_lost(self):
-        for ch in self.channels:
-            if not ch.listening:
-                ch.packet_lost()
+    def __getitem__(self, k) -> Channel:
+        ch = self._cache[k]
+        if ch is None:
+            ch = self._cache[k] = self.channels.get_ch(self.ids[k])
+        return ch
 
-    def get_ch(self, channel_index):
-        return self.channels[channel_index if 0 < channel_index < 40 else 0]
 
-    pass
+def assign_channels(num_channels, num_receivers, assignment="CONTIGUOUS") -> list:
+    """
+    返回每个接收机管理的信道编号序列
+    """
+    if assignment == "ALL":
+        return [range(num_channels)] * num_receivers
+    if assignment == "CONTIGUOUS":
+        return [
+            range(i * num_channels // num_receivers, (i + 1) * num_channels // num_receivers)
+            for i in range(num_receivers)
+        ]
+    if assignment == "INTERLEAVED":
+        return [range(i, num_channels, num_receivers) for i in range(num_receivers)]
+    if assignment == "OVERLAPPING":
+        groups = []
+        for i in range(num_receivers):
+            start = i * num_channels // num_receivers
+            end = (i + 2) * num_channels // num_receivers
+            groups.append(
+                [c % num_channels for c in range(start, min(end, start + num_channels))]
+            )
+        return groups
+    raise ValueError(f"Unknown channel assignment {assignment}")
@@ -0,0 +1,50 @@
+import math
+
+# 自由度1~30的t分布0.975分位数，用于95%置信区间
+T975 = (
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+)
+
+
+def t975(df) -> float:
+    # 自由度超过30时用近似式，误差小于0.002
+    return T975[df - 1] if df <= 30 else 1.96 + 2.4 / df
+
+
+class BatchMeans:
+    """
+    批均值法：每batch_steps个时间步算一次该批的丢包率，
+    用各批丢包率的均值和标准误估计丢包率的95%置信区间
+    """
+
+    def __init__(self, batch_steps=60 * 1000, min_batches=10):
+        self.batch_steps = batch_steps
+        self.min_batches = min_batches
+        self.rates: list[float] = []
+        self._received = 0
+        self._lost = 0
+
+    def add_batch(self, received, lost):
+        # received/lost为到目前为止的累计包数
+        batch_received = received - self._received
+        batch_lost = lost - self._lost
+        self._received, self._lost = received, lost
+        if batch_received + batch_lost > 0:
+            self.rates.append(batch_lost / (batch_received + batch_lost))
+
+    @property
+    def mean(self) -> float:
+        return sum(self.rates) / len(self.rates) if self.rates else float("nan")
+
+    def half_width(self) -> float:
+        n = len(self.rates)
+        if n < 2:
+            return float("inf")
+        mean = self.mean
+        variance = sum((r - mean) ** 2 for r in self.rates) / (n - 1)
+        return t975(n - 1) * math.sqrt(variance / n)
+
+    def converged(self, tolerance) -> bool:
+        return len(self.rates) >= self.min_batches and self.half_width() < tolerance
@@ -0,0 +1,120 @@
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+from time import perf_counter
+import Sweep
+from Results import RESULT_FORMATS, ResultWriter
+
+# 无界面批量进程的入口：全部配置来自命令行参数，不读全局配置、不画图、不显示进度条
+#   python -m Headless run --senders 15 --steps 600000
+#   python -m Headless import-check
+# 工作进程的冷启动导入时间上限（毫秒），由tests/test_headless.py检查，import-check也可手动运行
+IMPORT_BUDGET_MS = 250
+# 这些库导入很慢，只应在画图、显示进度或读写parquet时才加载
+HEAVY_MODULES = ("matplotlib", "tqdm", "pyarrow", "yaml")
+# 冷启动时测量的导入，即run子命令和Sweep工作进程实际加载的模块
+_IMPORT_PROBE = """
+import sys
+from time import perf_counter
+t = perf_counter()
+import Sweep
+print((perf_counter() - t) * 1000)
+print(",".join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def _grid_arg(key, default):
+    # 参数名与Sweep参数网格的键一致，便于把网格中的一个点交给单独的进程运行
+    flag = "--" + key.replace("_", "-")
+    if key == "traffic_options":
+        return flag, {"type": json.loads, "default": default, "help": "JSON object"}
+    if default is None or isinstance(default, str):
+        return flag, {"default": default}
+    return flag, {"type": type(default), "default": default}
+
+
+def run(args) -> int:
+    config = {key: getattr(args, key) for key in Sweep.GRID_DEFAULTS}
+    start = perf_counter()
+    row, tables = Sweep.run_point(config, args.engine, args.results_dir is not None)
+    result = dict(config)
+    result.update(zip(Sweep.RESULT_COLUMNS, row))
+    result["elapsed_s"] = round(perf_counter() - start, 3)
+    if args.results_dir is not None:
+        ResultWriter(args.results_dir, args.results_format).write(tables)
+    if args.output:
+        new_file = not os.path.exists(args.output)
+        with open(args.output, "a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(list(Sweep.GRID_DEFAULTS) + Sweep.RESULT_COLUMNS)
+            writer.writerow(list(config.values()) + row)
+    print(json.dumps(result))
+    return 0
+
+
+def measure_imports(repeat=5) -> tuple[float, list[str]]:
+    """
+    在全新的解释器中测量导入时间，取repeat次中的最小值以排除磁盘缓存等干扰
+    返回(毫秒, 被提前加载的重量级库)
+    """
+    probe = _IMPORT_PROBE.format(heavy=HEAVY_MODULES)
+    here = os.path.dirname(os.path.abspath(__file__))
+    best = float("inf")
+    loaded = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", probe],
+            cwd=here,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.splitlines()
+        best = min(best, float(out[0]))
+        loaded = [m for m in out[1].split(",") if m] if len(out) > 1 else []
+    return best, loaded
+
+
+def import_check(args) -> int:
+    elapsed, loaded = measure_imports(args.repeat)
+    print(f"Cold import: {elapsed:.1f}ms (budget {args.budget}ms)")
+    ok = True
+    if loaded:
+        print(f"Heavy modules imported eagerly: {', '.join(loaded)}")
+        ok = False
+    if elapsed > args.budget:
+        print("Import budget exceeded")
+        ok = False
+    return 0 if ok else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless batch worker")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_parser = sub.add_parser("run", help="run one simulation point")
+    for key, default in Sweep.GRID_DEFAULTS.items():
+        flag, kwargs = _grid_arg(key, default)
+        run_parser.add_argument(flag, dest=key, **kwargs)
+    run_parser.add_argument(
+        "--engine", choices=["EVENT", "TICK"], default=Sweep.Simulator.SIM_ENGINE
+    )
+    run_parser.add_argument("--output", default=None, help="append result row to CSV")
+    run_parser.add_argument(
+        "--results-dir", default=None, help="also write detail tables here"
+    )
+    run_parser.add_argument("--results-format", choices=RESULT_FORMATS, default=None)
+    check = sub.add_parser("import-check", help="enforce the cold import budget")
+    check.add_argument("--budget", type=float, default=IMPORT_BUDGET_MS, help="ms")
+    check.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        return run(args)
+    return import_check(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+from array import array
+
+SUB_BITS = 5  # 每个2的幂区间再分16个子桶，相对误差不超过1/16
+SUB_COUNT = 1 << SUB_BITS
+MAX_BUCKETS = (40 << (SUB_BITS - 1)) + SUB_COUNT  # 覆盖到2^40毫秒，更大的值计入最后一个桶
+EMPTY_MIN = 1 << 62  # 没有样本时的最小值
+
+
+def bucket_index(value) -> int:
+    # 小于SUB_COUNT的值每个值一个桶，之后按对数分桶
+    if value < SUB_COUNT:
+        return value if value > 0 else 0
+    e = value.bit_length() - SUB_BITS
+    return min((e << (SUB_BITS - 1)) + (value >> e), MAX_BUCKETS - 1)
+
+
+def bucket_range(index) -> tuple[int, int]:
+    # 桶内值的范围[lo, hi]
+    if index < SUB_COUNT:
+        return index, index
+    e = (index >> (SUB_BITS - 1)) - 1
+    m = index - (e << (SUB_BITS - 1))
+    return m << e, ((m + 1) << e) - 1
+
+
+class LogHistogram:
+    """
+    HDR风格的对数分桶直方图（毫秒，非负整数），内存只取决于出现过的最大桶，与样本数无关
+    """
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = array("q", bytes(8 * SUB_COUNT))  # 线性区的桶预先分配
+        self.count = 0
+        self.total = 0
+        self.min = EMPTY_MIN
+        self.max = 0
+
+    def record(self, value):
+        # 每个收到或丢弃的包调用一次，线性区走快速路径
+        if 0 <= value < SUB_COUNT:
+            self.counts[value] += 1
+        else:
+            i = bucket_index(value)
+            counts = self.counts
+            if i >= len(counts):
+                counts.extend([0] * (i + 1 - len(counts)))
+            counts[i] += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def merge(self, other: "LogHistogram"):
+        if not other.count:
+            return
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for i, c in enumerate(other.counts):
+            self.counts[i] += c
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else float("nan")
+
+    def percentile(self, q) -> float:
+        # q为0~100，返回所在桶的上界（不超过最大值），没有样本时为nan
+        if not self.count:
+            return float("nan")
+        rank = max(1, -(-self.count * q // 100))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return min(bucket_range(i)[1], self.max)
+        return self.max
+
+    def summary(self) -> str:
+        if not self.count:
+            return "p50=-, p99=-, p999=-"
+        return (
+            f"p50={self.percentile(50):.0f}ms, p99={self.percentile(99):.0f}ms, "
+            f"p999={self.percentile(99.9):.0f}ms"
+        )
+
+
+def merged(histograms) -> LogHistogram:
+    result = LogHistogram()
+    for h in histograms:
+        if h is not None:
+            result.merge(h)
+    return result
@@ -1,9 +1,14 @@
 class Packet():
     """
     packet to be sent and received
+    packet_id是发送者的整数编号，显示名称见Simulator.sender_names
+    timestep是发送时间步，用于统计接收延迟和丢包时包的滞留时间，-1表示未知
     """
-    
-    def __init__(self,packet_id:str,x=0,y=0):
+
+    __slots__ = ("packet_id", "x", "y", "timestep")
+
+    def __init__(self,packet_id:int,x=0,y=0,timestep=-1):
         self.packet_id = packet_id
         self.x = x
-        self.y = y
\ No newline at end of file
+        self.y = y
+        self.timestep = timestep
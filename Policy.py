@@ -0,0 +1,96 @@
+from functools import partial
+
+# 接收策略注册表：策略名 -> 策略对象
+POLICIES = {}
+
+
+class ReceiverPolicy:
+    """
+    接收策略，在Simulator初始化时绑定到接收机，得到每个时间步调用的step(cur_timestep)
+    polling: DWELL中是否驻留计时；scheduling: DWELL中是否扫描计划发送者（供事件引擎预测下一事件）
+    """
+
+    name = ""
+    polling = True
+    scheduling = False
+
+    def bind(self, recver):
+        raise NotImplementedError
+
+
+def register_policy(cls):
+    # 类装饰器，新的接收算法注册后即可在sim_mode或policies参数中按名字选用
+    POLICIES[cls.name] = cls()
+    return cls
+
+
+def get_policy(name) -> ReceiverPolicy:
+    try:
+        return POLICIES[name]
+    except KeyError:
+        raise ValueError(f"Unknown receiver policy {name}") from None
+
+
+@register_policy
+class PollingPolicy(ReceiverPolicy):
+    name = "polling"
+
+    def bind(self, recver):
+        return partial(recver.packet_recv, just_polling=True)
+
+
+@register_policy
+class LimitedPollingPolicy(ReceiverPolicy):
+    # 只轮询已发现发送者的信道
+    name = "limited-polling"
+
+    def bind(self, recver):
+        return partial(recver.packet_recv, just_polling=True, limited_polling=True)
+
+
+@register_policy
+class WeightedPollingPolicy(ReceiverPolicy):
+    # 只轮询已发现发送者的信道，各信道被轮询的次数与观测到的发包速率成正比
+    name = "weighted-polling"
+
+    def bind(self, recver):
+        recver.senders_channel_index.track_rates = True
+        return partial(recver.packet_recv, just_polling=True, weighted_polling=True)
+
+
+@register_policy
+class SchedulingPolicy(ReceiverPolicy):
+    name = "scheduling"
+    polling = False
+    scheduling = True
+
+    def bind(self, recver):
+        return recver.packet_schedule_recv
+
+
+@register_policy
+class PollingAndSchedulingPolicy(ReceiverPolicy):
+    # 轮询驻留，计划发送者快到时切过去接收
+    name = "polling-and-scheduling"
+    scheduling = True
+
+    def bind(self, recver):
+        return partial(recver.packet_recv, just_polling=False)
+
+
+# 仿真模式 -> 各接收机的策略，接收机多于列表长度时其余沿用最后一个
+MODE_POLICIES = {
+    "R1-Rn-polling": ("polling",),
+    "R1-polling-R2-scheduling": ("polling", "scheduling"),
+    "R1-polling-R2-limited-polling": ("polling", "limited-polling"),
+    "R1-polling-R2-weighted-polling": ("polling", "weighted-polling"),
+    "R1-Rn-both-scheduling-and-polling": ("polling-and-scheduling",),
+}
+
+
+def mode_policies(sim_mode, num_receivers) -> list:
+    try:
+        names = MODE_POLICIES[sim_mode]
+    except KeyError:
+        raise ValueError(f"Unknown sim mode {sim_mode}") from None
+    return [names[min(i, len(names) - 1)] for i in range(num_receivers)]
@@ -0,0 +1,94 @@
+import cProfile
+import json
+import pstats
+from time import perf_counter
+
+PHASES = ("senders", "receivers", "recording", "loss", "next_event", "skip", "progress")
+
+
+class PhaseProfiler:
+    """
+    Simulator.run的分阶段计时，每sample_every个时间步采样一次，
+    估计总耗时 = 采样耗时 * sample_every
+    """
+
+    def __init__(self, sample_every=100):
+        self.sample_every = sample_every
+        self.sampling = False
+        self.ticks = 0
+        self.sampled_ticks = 0
+        self.phase_calls = dict.fromkeys(PHASES, 0)
+        self.phase_seconds = dict.fromkeys(PHASES, 0.0)
+        self.receiver_calls: dict[int, int] = {}
+        self.receiver_seconds: dict[int, float] = {}
+        # (接收机, 状态) -> 次数/耗时，状态取该时间步开始时的状态
+        self.state_calls: dict[tuple[int, str], int] = {}
+        self.state_seconds: dict[tuple[int, str], float] = {}
+
+    def should_sample(self) -> bool:
+        self.ticks += 1
+        self.sampling = self.ticks % self.sample_every == 0
+        if self.sampling:
+            self.sampled_ticks += 1
+        return self.sampling
+
+    def add(self, phase, start):
+        self.phase_calls[phase] += 1
+        self.phase_seconds[phase] += perf_counter() - start
+
+    def add_receiver(self, index, state, start):
+        elapsed = perf_counter() - start
+        self.receiver_calls[index] = self.receiver_calls.get(index, 0) + 1
+        self.receiver_seconds[index] = self.receiver_seconds.get(index, 0.0) + elapsed
+        key = (index, state)
+        self.state_calls[key] = self.state_calls.get(key, 0) + 1
+        self.state_seconds[key] = self.state_seconds.get(key, 0.0) + elapsed
+
+    def report(self) -> dict:
+        scale = self.sample_every
+        return {
+            "sample_every": self.sample_every,
+            "ticks": self.ticks,
+            "sampled_ticks": self.sampled_ticks,
+            "phases": {
+                phase: {
+                    "calls": self.phase_calls[phase],
+                    "seconds": self.phase_seconds[phase],
+                    "estimated_seconds": self.phase_seconds[phase] * scale,
+                }
+                for phase in PHASES
+            },
+            "receivers": {
+                str(i): {
+                    "calls": self.receiver_calls[i],
+                    "seconds": self.receiver_seconds[i],
+                    "states": {
+                        state: {
+                            "calls": self.state_calls[(j, state)],
+                            "seconds": self.state_seconds[(j, state)],
+                        }
+                        for (j, state) in self.state_calls
+                        if j == i
+                    },
+                }
+                for i in sorted(self.receiver_calls)
+            },
+        }
+
+    def to_json(self, filename):
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+def profile_run(sim, step_limit, filename="sim_profile.pstats") -> pstats.Stats:
+    """
+    用cProfile完整记录一次运行，结果保存为pstats文件
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        sim.run(step_limit=step_limit, progress=False)
+    finally:
+        profiler.disable()
+    profiler.dump_stats(filename)
+    return pstats.Stats(filename)
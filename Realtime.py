@@ -0,0 +1,215 @@
+import argparse
+import asyncio
+import json
+import struct
+import sys
+from array import array
+from time import perf_counter_ns
+import numpy as np
+from Packet import Packet
+
+# 数据报内容：发送者编号, 发送时间步, 发送时刻(perf_counter_ns)
+DATAGRAM = struct.Struct("<IqQ")
+TICK_NS = 1_000_000  # 一个时间步为1ms
+
+
+class Datagram(Packet):
+    # 经UDP到达的包，带发送时刻用于计算端到端延迟
+    __slots__ = ("sent_ns",)
+
+    def __init__(self, packet_id: int, timestep: int, sent_ns: int):
+        super().__init__(packet_id, timestep=timestep)
+        self.sent_ns = sent_ns
+
+
+class _ChannelProtocol(asyncio.DatagramProtocol):
+    # 信道端口收到的数据报直接进入对应信道，没有接收机监听时由丢包逻辑丢弃
+    def __init__(self, driver, channel):
+        self.driver = driver
+        self.channel = channel
+
+    def datagram_received(self, data, addr):
+        self.channel.packet_append(Datagram(*DATAGRAM.unpack(data)))
+        self.driver.arrived += 1
+
+
+def _stats(values_ns) -> dict:
+    values = np.array(values_ns, dtype=np.float64) / 1e6
+    if not len(values):
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p99": float(np.percentile(values, 99)),
+        "max": float(values.max()),
+    }
+
+
+class RealtimeDriver:
+    """
+    按墙上时钟以1ms一个时间步驱动Simulator：发送者把包发到本机UDP端口（每个信道一个），
+    到达的数据报进入对应信道，接收机按原有状态机收包，切换信道照样要channel_switch_time个时间步
+    主机跟不上时仿真时间随墙上时钟前进，落后的时间步直接跳过并计入missed_ticks
+    """
+
+    def __init__(self, sim, host="127.0.0.1", base_port=0, spin_ms=1.0):
+        self.sim = sim
+        self.host = host
+        # base_port为0时每个信道使用系统分配的端口，否则为base_port+信道编号
+        self.base_port = base_port
+        # 距离时间步起点不足spin_ms时改为忙等，asyncio.sleep的精度通常只有1ms
+        self.spin_ns = int(spin_ms * 1e6)
+        self.ports: dict[int, int] = {}  # 信道编号 -> 端口
+        self._transports = []
+        self._sender = None
+        self.jitter_ns = array("q")  # 每个时间步实际开始时刻相对计划时刻的延后
+        self.latency_ns = array("q")  # 每个收到的包从发出到被接收机取走的时间
+        self.ticks = 0
+        self.missed_ticks = 0
+        self.sent = 0
+        self.arrived = 0
+
+    async def _open_channel(self, channel_index):
+        loop = asyncio.get_running_loop()
+        channel = self.sim.channels.get_ch(channel_index)
+        port = self.base_port + channel_index if self.base_port else 0
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _ChannelProtocol(self, channel), local_addr=(self.host, port)
+        )
+        self._transports.append(transport)
+        self.ports[channel_index] = transport.get_extra_info("sockname")[1]
+
+    async def _wait_until(self, deadline_ns):
+        remaining = deadline_ns - perf_counter_ns()
+        if remaining > self.spin_ns:
+            await asyncio.sleep((remaining - self.spin_ns) / 1e9)
+        # 至少让出一次，处理已到达的数据报
+        await asyncio.sleep(0)
+        while perf_counter_ns() < deadline_ns:
+            await asyncio.sleep(0)
+
+    async def _tick(self):
+        sim = self.sim
+        t = sim.cur_timestep
+        # 跳过的时间步里该发的包在本时间步补发
+        traffic = sim.traffic
+        while traffic.next_timestep() <= t:
+            for s in sim._due_senders(traffic.next_timestep()):
+                if s.channel_index not in self.ports:
+                    await self._open_channel(s.channel_index)
+                s.last_timestep = t
+                self._sender.sendto(
+                    DATAGRAM.pack(s.packet_id, t, perf_counter_ns()),
+                    (self.host, self.ports[s.channel_index]),
+                )
+                self.sent += 1
+        recorder = sim.recorder if sim.recorder.enabled else None
+        for i, (recver, step) in enumerate(zip(sim.recvers, sim.recv_steps)):
+            state, received = step(t)
+            if received and isinstance(recver.last_packet, Datagram):
+                self.latency_ns.append(perf_counter_ns() - recver.last_packet.sent_ns)
+            if recorder:
+                recorder.record(i, t, state, received)
+        sim.channels.all_channel_lost(t)
+
+    def _skip(self, steps):
+        sim = self.sim
+        if sim.recorder.enabled:
+            for i, recver in enumerate(sim.recvers):
+                sim.recorder.record_span(i, sim.cur_timestep, steps, recver.state)
+        sim.cur_timestep += steps
+        self.missed_ticks += steps
+
+    async def run(self, duration_ms):
+        sim = self.sim
+        loop = asyncio.get_running_loop()
+        for channel_index in sorted({s.channel_index for s in sim.senders}):
+            await self._open_channel(channel_index)
+        self._sender, _ = await loop.create_datagram_endpoint(
+            asyncio.DatagramProtocol, local_addr=(self.host, 0)
+        )
+        first = sim.cur_timestep
+        end = first + duration_ms
+        start_ns = perf_counter_ns()
+        try:
+            while sim.cur_timestep < end:
+                deadline = start_ns + (sim.cur_timestep - first) * TICK_NS
+                await self._wait_until(deadline)
+                lag = perf_counter_ns() - deadline
+                self.jitter_ns.append(lag)
+                behind = min(lag // TICK_NS, end - sim.cur_timestep)
+                if behind:
+                    self._skip(behind)
+                    if sim.cur_timestep >= end:
+                        break
+                await self._tick()
+                sim.cur_timestep += 1
+                self.ticks += 1
+            # 等待途中的数据报到达，计入arrived
+            await asyncio.sleep(0.01)
+        finally:
+            self._sender.close()
+            for transport in self._transports:
+                transport.close()
+            self._transports = []
+
+    def report(self) -> dict:
+        received, lost = self.sim.packet_totals()
+        return {
+            "ticks": self.ticks,
+            "missed_ticks": self.missed_ticks,
+            "datagrams_sent": self.sent,
+            "datagrams_arrived": self.arrived,
+            "received": received,
+            "lost": lost,
+            "jitter_ms": _stats(self.jitter_ns),
+            "latency_ms": _stats(self.latency_ns),
+        }
+
+
+def run_realtime(sim, duration_ms, **kwargs) -> dict:
+    driver = RealtimeDriver(sim, **kwargs)
+    asyncio.run(driver.run(duration_ms))
+    return driver.report()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Drive the receivers in real time against localhost UDP channels"
+    )
+    parser.add_argument("--duration", type=int, default=10 * 1000, help="milliseconds")
+    parser.add_argument("--mode", default=None, help="simulation mode")
+    parser.add_argument("--senders", type=int, default=15)
+    parser.add_argument("--receivers", type=int, default=2)
+    parser.add_argument("--channels", type=int, default=40)
+    parser.add_argument("--traffic", default="PERIODIC")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--base-port", type=int, default=0, help="0: ephemeral ports")
+    parser.add_argument("--spin-ms", type=float, default=1.0, help="busy-wait window")
+    parser.add_argument("--output", default=None, help="write report as JSON")
+    args = parser.parse_args(argv)
+
+    from Simulator import Simulator
+
+    sim = Simulator(
+        num_senders=args.senders,
+        seed=args.seed,
+        record_mode="OFF",
+        sim_mode=args.mode,
+        num_channels=args.channels,
+        num_receivers=args.receivers,
+        traffic=args.traffic,
+    )
+    report = run_realtime(
+        sim, args.duration, base_port=args.base_port, spin_ms=args.spin_ms
+    )
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,108 +1,446 @@
-from dataclasses import dataclass, field
+import heapq
+from array import array
 from Packet import Packet
-from Channel import Channel
-from collections import deque
-from dbg_print import dbg_print
+from Channel import Channel, ChannelGroup
+from Histogram import LogHistogram
+from Tracer import tracer, TraceEvent
+
+SCHEDULE_WINDOW = 20  # 计划包在20ms内到达时切换过去接收
+SCHEDULE_EXPIRE = 3600 * 1000  # 计划时间超过一小时的发送者删除
+UNMEASURED_INTERVAL = 1000  # 只收到过一个包的发送者，按每秒一包估计发包速率
+
+# 接收机状态（"DWELL"在仅调度模式下作为空闲状态）
+DWELL = 0
+SWITCH = 1
+SCHEDULE = 2
+SWITCH_TO_SCHEDULE = 3
+STATE_NAMES = ("DWELL", "SWITCH", "SCHEDULE", "SWITCH_TO_SCHEDULE")
+
+# 状态转移事件
+SWITCH_DONE = 0  # 切换时间到
+SCHEDULE_ELSEWHERE = 1  # 计划发送者在其他信道
+SCHEDULE_HERE = 2  # 计划发送者就在当前轮询信道
+SCHEDULE_END_ELSEWHERE = 3  # 计划接收结束，轮询信道不是当前信道
+SCHEDULE_END_HERE = 4  # 计划接收结束，轮询信道就是当前信道
+DWELL_END_ELSEWHERE = 5  # 驻留时间到，下一个轮询信道不是当前信道
+DWELL_END_HERE = 6  # 驻留时间到，下一个轮询信道仍是当前信道
+
+# 状态转移表：(状态, 事件) -> 新状态
+TRANSITIONS = {
+    (SWITCH, SWITCH_DONE): DWELL,
+    (SWITCH_TO_SCHEDULE, SWITCH_DONE): SCHEDULE,
+    (DWELL, SCHEDULE_ELSEWHERE): SWITCH_TO_SCHEDULE,
+    (DWELL, SCHEDULE_HERE): SCHEDULE,
+    (SCHEDULE, SCHEDULE_END_ELSEWHERE): SWITCH,
+    (SCHEDULE, SCHEDULE_END_HERE): DWELL,
+    (DWELL, DWELL_END_ELSEWHERE): SWITCH,
+    (DWELL, DWELL_END_HERE): DWELL,
+}
+
+# 切换状态 -> (切换中事件, 切换完成事件)
+SWITCH_TRACE = {
+    SWITCH: (TraceEvent.SWITCHING, TraceEvent.SWITCHED),
+    SWITCH_TO_SCHEDULE: (TraceEvent.SWITCHING_TO_SCHEDULE, TraceEvent.SWITCHED_TO_SCHEDULE),
+}
 
 
-@dataclass
 class sender_info:
-    id: str
-    last_sent_timestep: int
-    send_times: int
-    next_send_timestep: int
-    interval_history: deque[int]
-    min_interval: int = 3600000  # 初始设为1小时
-    channel_index: int = -1
-    interval_frequency: dict = field(default_factory=dict)
+    """
+    发送者信息，间隔历史保存在固定大小的环形缓冲区中，
+    总和、最小值、众数随追加增量维护
+    """
+
+    __slots__ = (
+        "id",
+        "last_sent_timestep",
+        "send_times",
+        "next_send_timestep",
+        "min_interval",
+        "channel_index",
+        "interval_frequency",
+        "_buf",
+        "_head",
+        "_len",
+        "_sum",
+        "_mode",
+        "_mode_dirty",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        last_sent_timestep: int,
+        send_times: int,
+        next_send_timestep: int,
+        min_interval: int = 3600000,  # 初始设为1小时
+        channel_index: int = -1,
+        history_size: int = 100,
+    ):
+        self.id = id
+        self.last_sent_timestep = last_sent_timestep
+        self.send_times = send_times
+        self.next_send_timestep = next_send_timestep
+        self.min_interval = min_interval
+        self.channel_index = channel_index
+        self.interval_frequency: dict[int, int] = {}
+        self._buf = array("i", bytes(4 * history_size))
+        self._head = 0
+        self._len = 0
+        self._sum = 0
+        self._mode = -1
+        self._mode_dirty = False
+
+    def __repr__(self):
+        return (
+            f"sender_info(id={self.id!r}, last_sent_timestep={self.last_sent_timestep}, "
+            f"send_times={self.send_times}, next_send_timestep={self.next_send_timestep}, "
+            f"min_interval={self.min_interval}, channel_index={self.channel_index})"
+        )
+
+    def _drop(self, interval: int):
+        self._sum -= interval
+        freq = self.interval_frequency
+        freq[interval] -= 1
+        if not freq[interval]:
+            # 只保留历史中还有的间隔，字典大小不超过历史长度
+            del freq[interval]
+        if interval == self._mode:
+            self._mode_dirty = True
 
     def append_interval(self, interval: int):
         # 维护间隔历史、最小间隔和各间隔频率字典
         if interval < self.min_interval:
             self.min_interval = interval
-        if len(self.interval_history) == self.interval_history.maxlen:
+        buf = self._buf
+        size = len(buf)
+        if self._len == size:
             # 最小间隔要保留，其余都可以删除
-            if self.interval_history[0] == self.min_interval:
-                self.interval_frequency[self.interval_history[1]] -= 1
-                del self.interval_history[1]
+            front = buf[self._head]
+            second = (self._head + 1) % size
+            if front == self.min_interval:
+                # 删除第二个元素：把队首后移一格覆盖它
+                self._drop(buf[second])
+                buf[second] = front
             else:
-                self.interval_frequency[self.interval_history.popleft()] -= 1
-        self.interval_history.append(interval)
-        self.interval_frequency[interval] = self.interval_frequency.get(interval, 0) + 1
+                self._drop(front)
+            self._head = second
+            self._len -= 1
+        buf[(self._head + self._len) % size] = interval
+        self._len += 1
+        self._sum += interval
+        count = self.interval_frequency.get(interval, 0) + 1
+        self.interval_frequency[interval] = count
+        if not self._mode_dirty and interval != self._mode:
+            mode_count = self.interval_frequency.get(self._mode, 0)
+            if count > mode_count:
+                self._mode = interval
+            elif count == mode_count:
+                # 次数相同时取字典中先出现的间隔，交给mode_interval重新计算
+                self._mode_dirty = True
+
+    @property
+    def interval_history(self) -> list:
+        size = len(self._buf)
+        return [self._buf[(self._head + i) % size] for i in range(self._len)]
 
     @property
     def last_interval(self) -> int:
-        return self.interval_history[-1] if self.interval_history else -1
+        if not self._len:
+            return -1
+        return self._buf[(self._head + self._len - 1) % len(self._buf)]
 
     @property
     def average_interval(self) -> float:
-        if not self.interval_history:
+        if not self._len:
             return -1.0
-        return sum(self.interval_history) / len(self.interval_history)
+        return self._sum / self._len
 
     @property
     def mode_interval(self) -> int:
         if not self.interval_frequency:
             return -1
-        mode = max(self.interval_frequency, key=self.interval_frequency.get)
-        return mode
+        if self._mode_dirty:
+            self._mode = max(self.interval_frequency, key=self.interval_frequency.get)
+            self._mode_dirty = False
+        return self._mode
 
     @property
     def content_interval(self) -> list:
-        return list(self.interval_history)
+        return self.interval_history
+
+
+class SenderSchedule:
+    """
+    发送者信息表及其计划接收时间索引
+    _heap按(next_send_timestep, 插入序号)排序，_expiry按next_send_timestep倒序，
+    信息更新时直接压入新条目，旧条目在出堆时按惰性失效丢弃
+    """
+
+    def __init__(self):
+        self.infos: dict[int, sender_info] = {}
+        self._order: dict[int, int] = {}  # 字典插入序号，计划时间相同时先插入的优先
+        self._counter = 0
+        self._heap: list[tuple[int, int, int]] = []
+        self._expiry: list[tuple[int, int, int]] = []
+
+    def __contains__(self, sender_id):
+        return sender_id in self.infos
+
+    def __getitem__(self, sender_id) -> sender_info:
+        return self.infos[sender_id]
+
+    def add(self, info: sender_info):
+        self.infos[info.id] = info
+        self._order[info.id] = self._counter
+        self._counter += 1
+        self.update(info)
+
+    def remove(self, sender_id):
+        del self.infos[sender_id]
+        del self._order[sender_id]
+
+    def update(self, info: sender_info):
+        # info.next_send_timestep变化后调用
+        if info.next_send_timestep <= 0:
+            return
+        order = self._order[info.id]
+        heapq.heappush(self._heap, (info.next_send_timestep, order, info.id))
+        heapq.heappush(self._expiry, (-info.next_send_timestep, order, info.id))
+        if len(self._heap) > 2 * len(self.infos) + 64:
+            self._compact()
+
+    def _compact(self):
+        # 只有轮询接收机记录时没有人出堆，定期丢弃失效条目
+        self._heap = [
+            (info.next_send_timestep, self._order[sid], sid)
+            for sid, info in self.infos.items()
+            if info.next_send_timestep > 0
+        ]
+        heapq.heapify(self._heap)
+        self._expiry = [(-nxt, order, sid) for nxt, order, sid in self._heap]
+        heapq.heapify(self._expiry)
+
+    def _valid(self, nxt, order, sender_id) -> bool:
+        info = self.infos.get(sender_id)
+        return (
+            info is not None
+            and info.next_send_timestep == nxt
+            and self._order[sender_id] == order
+        )
+
+    def scan(self, cur_timestep) -> sender_info:
+        """
+        返回SCHEDULE_WINDOW内最早要发包的发送者，没有则返回None
+        同时重新规划已错过计划时间的发送者，删除计划时间超过一小时的发送者
+        """
+        heap = self._heap
+        held = []
+        # 错过接收时间，说明计划失败，重新规划下次接收时间
+        while heap and heap[0][0] <= cur_timestep:
+            entry = heapq.heappop(heap)
+            if not self._valid(*entry):
+                continue
+            if entry[0] == cur_timestep:
+                held.append(entry)
+                continue
+            info = self.infos[entry[2]]
+            info.next_send_timestep = cur_timestep + info.min_interval
+            self.update(info)
+        # 一小时没包，删除
+        expiry = self._expiry
+        while expiry and -expiry[0][0] - cur_timestep > SCHEDULE_EXPIRE:
+            nxt, order, sender_id = heapq.heappop(expiry)
+            if self._valid(-nxt, order, sender_id):
+                self.remove(sender_id)
+        winner = None
+        while heap and heap[0][0] - cur_timestep < SCHEDULE_WINDOW:
+            if self._valid(*heap[0]):
+                winner = self.infos[heap[0][2]]
+                break
+            heapq.heappop(heap)
+        for entry in held:
+            heapq.heappush(heap, entry)
+        return winner
+
+    def next_change_timestep(self, timestep) -> int:
+        # timestep及之后第一次scan会产生效果（进入窗口、错过重新规划、超时删除）的时间步
+        expiry = self._expiry
+        while expiry and not self._valid(-expiry[0][0], expiry[0][1], expiry[0][2]):
+            heapq.heappop(expiry)
+        if expiry and -expiry[0][0] - timestep > SCHEDULE_EXPIRE:
+            return timestep
+        heap = self._heap
+        held = []
+        next_timestep = float("inf")
+        while heap:
+            if not self._valid(*heap[0]):
+                heapq.heappop(heap)
+                continue
+            nxt = heap[0][0]
+            if nxt < timestep:
+                next_timestep = timestep
+            elif nxt == timestep:
+                # 正好在当前时间步，下一时间步才算错过
+                held.append(heapq.heappop(heap))
+                next_timestep = timestep + 1
+                continue
+            else:
+                next_timestep = min(
+                    next_timestep, max(timestep, nxt - SCHEDULE_WINDOW + 1)
+                )
+            break
+        for entry in held:
+            heapq.heappush(heap, entry)
+        return next_timestep
+
+
+class ChannelRing:
+    """
+    已发现发送者的信道（组内序号）按发现顺序组成的环，成员判断、前驱、后继都是O(1)
+    track_rates为True时同时累计各信道上发送者的发包速率（包/毫秒），供按活跃度轮询
+    """
+
+    __slots__ = ("order", "pos", "rates", "sender_rates", "track_rates")
+
+    def __init__(self):
+        self.order: list[int] = []
+        self.pos: dict[int, int] = {}  # 信道 -> 在order中的位置
+        self.rates: dict[int, float] = {}
+        self.sender_rates: dict[int, tuple[int, float]] = {}  # 发送者 -> (信道, 速率)
+        self.track_rates = False
+
+    def __len__(self):
+        return len(self.order)
+
+    def __contains__(self, idx):
+        return idx in self.pos
+
+    def __iter__(self):
+        return iter(self.order)
+
+    def add(self, idx):
+        if idx not in self.pos:
+            self.pos[idx] = len(self.order)
+            self.order.append(idx)
+            self.rates[idx] = 0.0
+
+    def prev(self, idx) -> int:
+        return self.order[self.pos[idx] - 1]
+
+    def next(self, idx) -> int:
+        return self.order[(self.pos[idx] + 1) % len(self.order)]
+
+    def observe(self, sender_id, idx, rate):
+        # 更新发送者的速率，发送者换了信道时从原信道扣除
+        old = self.sender_rates.get(sender_id)
+        if old is not None:
+            self.rates[old[0]] -= old[1]
+        self.sender_rates[sender_id] = (idx, rate)
+        self.rates[idx] += rate
 
 
 class Receiver:
     """
     packet receiver
+    整数状态机，状态变化按TRANSITIONS进行；切换、驻留、计划超时计时器保存为截止时间步，
+    到期前不需要逐毫秒累加，既可以逐毫秒驱动，也可以由事件引擎直接跳到截止时间
     """
 
     def __init__(
         self,
-        channels: list,
+        channels: ChannelGroup,
         index: int,
         channel_switch_time,
         channel_dwell_time,
-        uni_sender_info: dict = None,
-        uni_senders_channel_index: list = None,
+        uni_sender_info: SenderSchedule = None,
+        uni_senders_channel_index: ChannelRing = None,
     ):
         self.recver_index = index
-        self.managed_channels: list[Channel] = channels
+        self.managed_channels: ChannelGroup = channels
+        # 监听信道时使用的位，多个接收机可以同时监听同一信道
+        self.listen_mask = 1 << index
         self.poll_channel_idx = 0
         self.active_channel_idx = 0
 
-        self.state = "DWELL"  # or "SWITCH" or "SCHEDULE" or "SWITCH_TO_SCHEDULE" ("DWELL" used as "IDLE" in only scheduling mode)
+        self.state = DWELL
 
         self.switch_time = channel_switch_time
-        self.switch_timer = 0
         self.expected_dwell_time = channel_dwell_time
-        self.dwell_timer = 0
         self.max_schedule_timeout = channel_dwell_time
-        self.schedule_timeout_timer = 0
+        # 截止时间步：处理到该时间步时切换完成 / 驻留结束 / 计划超时
+        self.switch_deadline = 0
+        self.dwell_deadline = channel_dwell_time
+        self.schedule_deadline = 0
+        # 不在DWELL时剩余的驻留时间，回到DWELL后据此重新计算dwell_deadline
+        self.dwell_left = channel_dwell_time
         self.schedule_timeout_counter = 0
-
-        self.senders_info = {} if uni_sender_info is None else uni_sender_info
-        self.senders_channel_index = [] if uni_senders_channel_index is None else uni_senders_channel_index
+        # 最近收到的包，实时驱动据此计算端到端延迟
+        self.last_packet: Packet | None = None
+        # 按接收路径（轮询驻留 / 计划接收）统计的接收延迟
+        self.latency = {DWELL: LogHistogram(), SCHEDULE: LogHistogram()}
+
+        self.senders_schedule = (
+            SenderSchedule() if uni_sender_info is None else uni_sender_info
+        )
+        self.senders_info = self.senders_schedule.infos
+        self.senders_channel_index = (
+            ChannelRing() if uni_senders_channel_index is None else uni_senders_channel_index
+        )
+        # 按活跃度轮询时各信道的累计权重（平滑加权轮询）
+        self.poll_credit: dict[int, float] = {}
         self.first_switch_loop = False
 
     @property
     def current_channel(self):
         return self.managed_channels[self.active_channel_idx]
 
-    def poll_to_next_channel(self, channel_limited=False):
-        if channel_limited:
-            if self.poll_channel_idx in self.senders_channel_index:
-                next_poll_idx = self.senders_channel_index[
-                    (self.senders_channel_index.index(self.poll_channel_idx) - 1)
-                    % len(self.senders_channel_index)
-                ]
+    def _enter(self, event, first_timestep):
+        # 按转移表进入新状态，first_timestep为新状态第一次被处理的时间步
+        state = TRANSITIONS[self.state, event]
+        if state == DWELL:
+            self.dwell_deadline = first_timestep + self.dwell_left
+        elif state == SCHEDULE:
+            self.schedule_deadline = first_timestep + self.max_schedule_timeout
+        else:
+            self.switch_deadline = first_timestep + self.switch_time
+        self.state = state
+
+    def poll_to_next_channel(self, channel_limited=False, weighted=False) -> int:
+        # 更新轮询信道，返回驻留结束的转移事件
+        ring = self.senders_channel_index
+        if weighted and ring:
+            next_poll_idx = self._weighted_next_channel()
+        elif channel_limited:
+            if self.poll_channel_idx in ring:
+                next_poll_idx = ring.prev(self.poll_channel_idx)
             else:
-                next_poll_idx = self.senders_channel_index[0] if self.senders_channel_index else self.poll_channel_idx
+                next_poll_idx = ring.order[0] if ring else self.poll_channel_idx
         else:
             next_poll_idx = (self.poll_channel_idx + 1) % len(self.managed_channels)
-        if next_poll_idx != self.active_channel_idx:
-            self.state = "SWITCH"
         self.poll_channel_idx = next_poll_idx
+        if next_poll_idx != self.active_channel_idx:
+            return DWELL_END_ELSEWHERE
+        return DWELL_END_HERE
+
+    def _weighted_next_channel(self) -> int:
+        """
+        平滑加权轮询：每次所有信道加上各自的速率，取累计最大的信道并减去总速率，
+        长期看各信道被轮询的次数与发包速率成正比，且高速率信道的轮询均匀分散
+        """
+        ring = self.senders_channel_index
+        credit = self.poll_credit
+        total = 0.0
+        best = -1
+        best_credit = 0.0
+        for idx in ring.order:
+            rate = max(ring.rates[idx], 0.0)
+            c = credit.get(idx, 0.0) + rate
+            credit[idx] = c
+            total += rate
+            if best < 0 or c > best_credit:
+                best, best_credit = idx, c
+        credit[best] -= total
+        return best
 
     def switch_to_channel(self, idx: int):
         if 0 <= idx < len(self.managed_channels):
@@ -111,262 +449,245 @@ class Receiver:
             raise IndexError("Channel index out of range.")
 
     def record_sender_info(self, packet: Packet, cur_timestep) -> int:
+        self.last_packet = packet
         # 记录发送者信道
-        if self.poll_channel_idx not in self.senders_channel_index:
-            self.senders_channel_index.append(self.poll_channel_idx)
+        ring = self.senders_channel_index
+        ring.add(self.poll_channel_idx)
         # 首次收到包，初始化发送者信息
-        if packet.packet_id not in self.senders_info:
-            self.senders_info[packet.packet_id] = sender_info(
-                id=packet.packet_id,
-                channel_index=self.poll_channel_idx,
-                last_sent_timestep=cur_timestep,
-                interval_history=deque(maxlen=100),
-                send_times=1,
-                next_send_timestep=-1,
+        info: sender_info = self.senders_info.get(packet.packet_id)
+        if info is None:
+            self.senders_schedule.add(
+                sender_info(
+                    id=packet.packet_id,
+                    channel_index=self.poll_channel_idx,
+                    last_sent_timestep=cur_timestep,
+                    send_times=1,
+                    next_send_timestep=-1,
+                )
             )
+            if ring.track_rates:
+                ring.observe(packet.packet_id, self.poll_channel_idx, 1 / UNMEASURED_INTERVAL)
             return 0
         else:  # 已有发送者记录，更新信息并预计发送时间
-            info: sender_info = self.senders_info[packet.packet_id]
             info.append_interval(cur_timestep - info.last_sent_timestep)
             info.last_sent_timestep = cur_timestep
             info.send_times += 1
 
-            # 规划下次接收包的时间，如果太短不足1s要延展到1s以上，以免频繁切换信道
-            next_send_timestep = cur_timestep + info.min_interval
-            while next_send_timestep - cur_timestep < 1000:
-                next_send_timestep += info.min_interval
-            info.next_send_timestep = next_send_timestep
+            # 规划下次接收包的时间，如果太短不足1s要延展到1s以上（取最小间隔的整数倍），以免频繁切换信道
+            multiple = max(1, -(-1000 // info.min_interval))
+            info.next_send_timestep = cur_timestep + multiple * info.min_interval
+            self.senders_schedule.update(info)
+            if ring.track_rates:
+                ring.observe(info.id, self.poll_channel_idx, 1 / info.average_interval)
 
             return info.send_times
 
-    def next_schedule_recv_time(self, cur_timestep, info: sender_info) -> int:
-        if info.next_send_timestep > 0:  # 有计划时间
-            while info.next_send_timestep < cur_timestep:
-                # 错过接收时间，说明计划失败，重新规划下次接收时间
-                info.next_send_timestep = cur_timestep + info.min_interval
-        return info.next_send_timestep - cur_timestep
-
-    def packet_recv(self, cur_timestep=0, just_polling=False, limited_polling=False) -> tuple[str, bool]:
-        if not just_polling:
-            # 不在切换状态时，先判断是否有计划数据包，如果有则优先接收，否则再进入轮询驻留模式
-            if self.state == "DWELL":
-                sender_schedule_time_min = 100000  # 一个很大的数
-                active_channel_index = -1
-                delete_ids = []
-                for sender_id, info in self.senders_info.items():
-                    # 计算下次计划接收时间
-                    sender_schedule_time = self.next_schedule_recv_time(
-                        cur_timestep, info
-                    )
-                    # 一小时没包，记录ID准备删除
-                    if sender_schedule_time > 3600 * 1000:
-                        delete_ids.append(sender_id)
-                        continue
-                    if (
-                        0 < sender_schedule_time < 20
-                        and sender_schedule_time < sender_schedule_time_min
-                    ):
-                        sender_schedule_time_min = sender_schedule_time
-                        active_channel_index = info.channel_index
-                # 开删！
-                for did in delete_ids:
-                    del self.senders_info[did]
-
-                if active_channel_index != -1:
-                    if active_channel_index != self.poll_channel_idx:
-                        # 切换到该发送者所在频道接收数据包
-                        self.current_channel.quit_listen()
-                        self.state = "SWITCH_TO_SCHEDULE"
-                        self.switch_to_channel(active_channel_index)
-                        self.active_channel_idx = active_channel_index
-                    else:
-                        # 已经在该频道，直接进入计划状态接收数据包
-                        self.state = "SCHEDULE"
-
-        if self.state == "SWITCH":
-            # 在切换时间内，不接收数据包
-            if self.switch_timer < self.switch_time:
-                self.switch_timer += 1
-                if self.first_switch_loop:
-                    dbg_print(
-                        f"Receiver {self.recver_index}: Switching to polling channel"
-                    )
-                    self.first_switch_loop = False
-
-            else:
-                # 切换完成，进入停留状态
-                self.first_switch_loop = True
-                self.switch_timer = 0
-                self.state = "DWELL"
-                dbg_print(
-                    f"Receiver {self.recver_index}: Switched to channel {self.poll_channel_idx }"
+    def _record_latency(self, path, channel: Channel, packet: Packet, cur_timestep):
+        if packet.timestep >= 0:
+            latency = cur_timestep - packet.timestep
+            self.latency[path].record(latency)
+            channel.record_latency(latency)
+
+    def next_scan_timestep(self, cur_timestep) -> int:
+        # 计划扫描下一次会产生效果的时间步
+        return self.senders_schedule.next_change_timestep(cur_timestep + 1)
+
+    def next_event_timestep(self, cur_timestep, polling=True, scheduling=False) -> int:
+        """
+        在信道没有新包的前提下，cur_timestep之后第一个状态会发生变化的时间步
+        polling: 是否在DWELL中驻留计时；scheduling: 是否在DWELL中扫描计划发送者
+        """
+        if self.state == SWITCH or self.state == SWITCH_TO_SCHEDULE:
+            return self.switch_deadline
+        if self.state == SCHEDULE:
+            return self.schedule_deadline
+        next_timestep = float("inf")
+        if polling:
+            next_timestep = self.dwell_deadline
+        if scheduling:
+            next_timestep = min(next_timestep, self.next_scan_timestep(cur_timestep))
+        return next_timestep
+
+    def _switch_channel_index(self) -> int:
+        # 切换目标信道编号，用于跟踪输出
+        # 只查编号，不会因为跟踪而创建信道对象
+        if self.state == SWITCH:
+            return self.managed_channels.ids[self.poll_channel_idx]
+        return self.managed_channels.ids[self.active_channel_idx]
+
+    def fast_forward(self, steps, polling=True, cur_timestep=-1):
+        # 跳过steps个不会发生状态变化的时间步，计时器是截止时间，只需补上监听和跟踪
+        if steps <= 0:
+            return
+        if self.state == SWITCH or self.state == SWITCH_TO_SCHEDULE:
+            if self.first_switch_loop and tracer.enabled:
+                tracer.emit(
+                    cur_timestep,
+                    SWITCH_TRACE[self.state][0],
+                    receiver=self.recver_index,
+                    channel=self._switch_channel_index(),
                 )
-
-        elif self.state == "SWITCH_TO_SCHEDULE":
-            # 在切换到计划包信道的时间内，不接收数据包
-            if self.switch_timer < self.switch_time:
-                self.switch_timer += 1
-                if self.first_switch_loop:
-                    dbg_print(
-                        f"Receiver {self.recver_index}: Switching to scheduled channel..."
-                    )
-                    self.first_switch_loop = False
-
-            else:
-                # 切换完成，进入计划状态
-                self.first_switch_loop = True
-                self.switch_timer = 0
-                self.state = "SCHEDULE"
-                dbg_print(
-                    f"Receiver {self.recver_index}: Switched to scheduled channel {self.active_channel_idx }"
-                )
-        elif self.state == "SCHEDULE":
-            self.current_channel.listen()
-            # 在计划时间内，接收数据包
-            if self.schedule_timeout_timer < self.max_schedule_timeout:
-                self.schedule_timeout_timer += 1
-                for _ in self.current_channel.packets:
-                    p = self.current_channel.packet_pop()
-                    dbg_print(
-                        f"Receiver {self.recver_index}: (Scheduled) Received Packet {p.packet_id} from channel {self.active_channel_idx }"
-                    )
-                    # 记录发送者信息
-                    self.record_sender_info(p, cur_timestep)
-
-                    # 接收到计划包，恢复轮询状态
-                    self.current_channel.quit_listen()
-                    self.schedule_timeout_timer = 0
-                    temp_state = self.state
-                    if self.poll_channel_idx != self.active_channel_idx:
-                        self.state = "SWITCH"
-                    else:
-                        self.state = "DWELL"
-                    dbg_print(
-                        f"Receiver {self.recver_index}: Schedule Received, switching to dwell state"
-                    )
-                    return (temp_state, True)
-            else:
-                # 计划时间结束，恢复轮询状态
-                self.current_channel.quit_listen()
-                self.schedule_timeout_timer = 0
-                self.schedule_timeout_counter += 1
-                if self.poll_channel_idx != self.active_channel_idx:
-                    self.state = "SWITCH"
-                else:
-                    self.state = "DWELL"
-                dbg_print(
-                    f"Receiver {self.recver_index}: Schedule timeout, switching to dwell state"
-                )
-        elif self.state == "DWELL":
-            # 同步活动频道索引
+            self.first_switch_loop = False
+        elif self.state == SCHEDULE:
+            self.current_channel.listen(self.listen_mask)
+        elif self.state == DWELL and polling:
             self.active_channel_idx = self.poll_channel_idx
-            self.current_channel.listen()
-            # 在停留时间内，接收数据包
-            if self.dwell_timer < self.expected_dwell_time:
-                self.dwell_timer += 1
-                p = self.current_channel.packet_pop()
-                if p:
-                    dbg_print(
-                        f"Receiver {self.recver_index}: Received Packet {p.packet_id} from channel {self.poll_channel_idx }"
+            self.current_channel.listen(self.listen_mask)
+
+    def _scan(self, cur_timestep) -> int:
+        # 20ms内有计划发包的发送者，取最早的一个，返回转移事件，没有则返回-1
+        info = self.senders_schedule.scan(cur_timestep)
+        if info is None:
+            return -1
+        if info.channel_index != self.poll_channel_idx:
+            # 切换到该发送者所在频道接收数据包
+            self.current_channel.quit_listen(self.listen_mask)
+            self.switch_to_channel(info.channel_index)
+            return SCHEDULE_ELSEWHERE
+        # 已经在该频道，直接进入计划状态接收数据包
+        return SCHEDULE_HERE
+
+    def _switch(self, cur_timestep) -> tuple[int, bool]:
+        # SWITCH和SWITCH_TO_SCHEDULE：切换时间内不接收数据包
+        if cur_timestep < self.switch_deadline:
+            if self.first_switch_loop:
+                if tracer.enabled:
+                    tracer.emit(
+                        cur_timestep,
+                        SWITCH_TRACE[self.state][0],
+                        receiver=self.recver_index,
+                        channel=self._switch_channel_index(),
                     )
-                    # 记录发送者信息，如果是第一次发包，等待下一次发包以便计算间隔
-                    if not self.record_sender_info(p, cur_timestep):
-                        self.dwell_timer = 0  # 重置停留时间，等待下一次发包
-                    return (self.state, True)
-                else:
-                    # dbg_print(f"Receiver {self.sender_index}: No Packet in channel {self.poll_channel_idx }")
-                    pass
-            else:
-                # 停留时间结束，进入切换状态
-                self.current_channel.quit_listen()
-                self.dwell_timer = 0
-                self.poll_to_next_channel(limited_polling)  # 切换状态，切换频道
-                dbg_print(
-                    f"Receiver {self.recver_index}: Dwell time ended, switching to next channel {self.poll_channel_idx }"
+                self.first_switch_loop = False
+        else:
+            # 切换完成，进入停留状态或计划状态
+            self.first_switch_loop = True
+            code = SWITCH_TRACE[self.state][1]
+            channel = self._switch_channel_index()
+            self._enter(SWITCH_DONE, cur_timestep + 1)
+            if tracer.enabled:
+                tracer.emit(
+                    cur_timestep, code, receiver=self.recver_index, channel=channel
                 )
         return (self.state, False)
 
-    def packet_schedule_recv(self, cur_timestep=0) -> tuple[str, bool]:
-        if self.state == "DWELL":
-            sender_schedule_time_min = 100000  # 一个很大的数
-            active_channel_index = -1
-            delete_ids = []
-            for sender_id, info in self.senders_info.items():
-                # 计算下次计划接收时间
-                sender_schedule_time = self.next_schedule_recv_time(cur_timestep, info)
-                # 一小时没包，记录ID准备删除
-                if sender_schedule_time > 3600 * 1000:
-                    delete_ids.append(sender_id)
-                    continue
-                if (
-                    0 < sender_schedule_time < 20
-                    and sender_schedule_time < sender_schedule_time_min
-                ):
-                    sender_schedule_time_min = sender_schedule_time
-                    active_channel_index = info.channel_index
-            # 开删！
-            for did in delete_ids:
-                del self.senders_info[did]
-
-            if active_channel_index != -1:
-                if active_channel_index != self.poll_channel_idx:
-                    # 切换到该发送者所在频道接收数据包
-                    self.current_channel.quit_listen()
-                    self.state = "SWITCH_TO_SCHEDULE"
-                    self.switch_to_channel(active_channel_index)
-                    self.active_channel_idx = active_channel_index
-                else:
-                    # 已经在该频道，直接进入计划状态接收数据包
-                    self.state = "SCHEDULE"
-
-        elif self.state == "SWITCH_TO_SCHEDULE":
-            # 在切换到计划包信道的时间内，不接收数据包
-            if self.switch_timer < self.switch_time:
-                self.switch_timer += 1
-                if self.first_switch_loop:
-                    dbg_print(
-                        f"Receiver {self.recver_index}: Switching to scheduled channel..."
+    def _schedule(self, cur_timestep, polling=True) -> tuple[int, bool]:
+        """
+        计划状态：在超时前接收计划包
+        polling为True时结束后回到轮询信道，否则留在当前信道空闲，收到包也计入schedule_timeout_counter
+        """
+        channel = self.current_channel
+        channel.listen(self.listen_mask)
+        if cur_timestep < self.schedule_deadline:
+            if channel.packets:
+                p = channel.packet_pop()
+                if tracer.enabled:
+                    tracer.emit(
+                        cur_timestep,
+                        TraceEvent.SCHEDULE_RECV,
+                        receiver=self.recver_index,
+                        channel=channel.channel_index,
+                        sender=p.packet_id,
                     )
-                    self.first_switch_loop = False
+                # 记录发送者信息
+                self._record_latency(SCHEDULE, channel, p, cur_timestep)
+                self.record_sender_info(p, cur_timestep)
 
-            else:
-                # 切换完成，进入计划状态
-                self.first_switch_loop = True
-                self.switch_timer = 0
-                self.state = "SCHEDULE"
-                dbg_print(
-                    f"Receiver {self.recver_index}: Switched to scheduled channel {self.active_channel_idx }"
-                )
-        elif self.state == "SCHEDULE":
-            self.current_channel.listen()
-            # 在计划时间内，接收数据包
-            if self.schedule_timeout_timer < self.max_schedule_timeout:
-                self.schedule_timeout_timer += 1
-                for _ in self.current_channel.packets:
-                    p = self.current_channel.packet_pop()
-                    dbg_print(
-                        f"Receiver {self.recver_index}: (Scheduled) Received Packet {p.packet_id} from channel {self.active_channel_idx }"
+                # 接收到计划包，恢复轮询状态
+                channel.quit_listen(self.listen_mask)
+                if not polling:
+                    self.schedule_timeout_counter += 1
+                self._end_schedule(cur_timestep, polling)
+                if tracer.enabled:
+                    tracer.emit(
+                        cur_timestep,
+                        TraceEvent.SCHEDULE_DONE,
+                        receiver=self.recver_index,
                     )
-                    # 记录发送者信息
-                    self.record_sender_info(p, cur_timestep)
+                return (SCHEDULE, True)
+        else:
+            # 计划时间结束，恢复轮询状态
+            channel.quit_listen(self.listen_mask)
+            self.schedule_timeout_counter += 1
+            self._end_schedule(cur_timestep, polling)
+            if tracer.enabled:
+                tracer.emit(
+                    cur_timestep,
+                    TraceEvent.SCHEDULE_TIMEOUT,
+                    receiver=self.recver_index,
+                )
+        return (self.state, False)
 
-                    # 接收到计划包，恢复轮询状态
-                    self.current_channel.quit_listen()
-                    self.schedule_timeout_timer = 0
-                    self.schedule_timeout_counter += 1
-                    temp_state = "SCHEDULE"
-                    self.state = "DWELL"
-                    dbg_print(
-                        f"Receiver {self.recver_index}: Schedule Received, switching to dwell state"
+    def _end_schedule(self, cur_timestep, polling):
+        if polling and self.poll_channel_idx != self.active_channel_idx:
+            self._enter(SCHEDULE_END_ELSEWHERE, cur_timestep + 1)
+        else:
+            self._enter(SCHEDULE_END_HERE, cur_timestep + 1)
+
+    def _dwell(self, cur_timestep, limited_polling=False, weighted_polling=False) -> tuple[int, bool]:
+        # 同步活动频道索引
+        self.active_channel_idx = self.poll_channel_idx
+        channel = self.current_channel
+        channel.listen(self.listen_mask)
+        # 在停留时间内，接收数据包
+        if cur_timestep < self.dwell_deadline:
+            if channel.packets:
+                p = channel.packet_pop()
+                if tracer.enabled:
+                    tracer.emit(
+                        cur_timestep,
+                        TraceEvent.RECV,
+                        receiver=self.recver_index,
+                        channel=channel.channel_index,
+                        sender=p.packet_id,
                     )
-                    return (temp_state, True)
-            else:
-                # 计划时间结束，恢复轮询状态
-                self.current_channel.quit_listen()
-                self.schedule_timeout_timer = 0
-                self.schedule_timeout_counter += 1
-                self.state = "DWELL"
-                dbg_print(
-                    f"Receiver {self.recver_index}: Schedule timeout, switching to dwell state"
+                self._record_latency(DWELL, channel, p, cur_timestep)
+                # 记录发送者信息，如果是第一次发包，重置停留时间等待下一次发包以便计算间隔
+                if not self.record_sender_info(p, cur_timestep):
+                    self.dwell_deadline = cur_timestep + 1 + self.expected_dwell_time
+                return (DWELL, True)
+        else:
+            # 停留时间结束，进入切换状态
+            channel.quit_listen(self.listen_mask)
+            self.dwell_left = self.expected_dwell_time
+            self._enter(
+                self.poll_to_next_channel(limited_polling, weighted_polling),
+                cur_timestep + 1,
+            )
+            if tracer.enabled:
+                tracer.emit(
+                    cur_timestep,
+                    TraceEvent.DWELL_END,
+                    receiver=self.recver_index,
+                    channel=self.managed_channels.ids[self.poll_channel_idx],
                 )
         return (self.state, False)
+
+    def packet_recv(
+        self, cur_timestep=0, just_polling=False, limited_polling=False, weighted_polling=False
+    ) -> tuple[int, bool]:
+        if not just_polling and self.state == DWELL:
+            # 不在切换状态时，先判断是否有计划数据包，如果有则优先接收，否则再进入轮询驻留模式
+            event = self._scan(cur_timestep)
+            if event != -1:
+                # 暂停驻留计时，新状态在本时间步就开始处理
+                self.dwell_left = self.dwell_deadline - cur_timestep
+                self._enter(event, cur_timestep)
+        state = self.state
+        if state == DWELL:
+            return self._dwell(cur_timestep, limited_polling, weighted_polling)
+        if state == SCHEDULE:
+            return self._schedule(cur_timestep)
+        return self._switch(cur_timestep)
+
+    def packet_schedule_recv(self, cur_timestep=0) -> tuple[int, bool]:
+        state = self.state
+        if state == DWELL:
+            # 空闲，扫描计划发送者，新状态从下一时间步开始处理
+            event = self._scan(cur_timestep)
+            if event != -1:
+                self._enter(event, cur_timestep + 1)
+            return (self.state, False)
+        if state == SCHEDULE:
+            return self._schedule(cur_timestep, polling=False)
+        return self._switch(cur_timestep)
@@ -0,0 +1,62 @@
+from array import array
+
+# "OFF": 不记录；"TRANSITIONS": 只记录状态跳变；"FULL": 状态跳变+接收事件
+RECORD_MODES = ("OFF", "TRANSITIONS", "FULL")
+
+
+class StateRecorder:
+    """
+    接收机状态时序记录，按游程编码只保存状态跳变时刻和接收事件时刻
+    """
+
+    def __init__(self, num_receivers, mode="FULL"):
+        if mode not in RECORD_MODES:
+            raise ValueError(f"Unknown record mode {mode}")
+        self.mode = mode
+        self.enabled = mode != "OFF"
+        self.full = mode == "FULL"
+        # 每个接收机：游程起点时间步、游程状态、接收事件时间步
+        self.run_starts = [array("q") for _ in range(num_receivers)]
+        self.run_states = [array("b") for _ in range(num_receivers)]
+        self.recv_timesteps = [array("q") for _ in range(num_receivers)]
+        self.num_steps = 0
+
+    def record(self, i, timestep, state, recved=False):
+        states = self.run_states[i]
+        if not states or states[-1] != state:
+            self.run_starts[i].append(timestep)
+            states.append(state)
+        if recved and self.full:
+            self.recv_timesteps[i].append(timestep)
+        if timestep >= self.num_steps:
+            self.num_steps = timestep + 1
+
+    def record_span(self, i, timestep, steps, state):
+        # 连续steps个时间步保持同一状态且无接收，只需记录一次
+        if steps > 0:
+            self.record(i, timestep, state)
+            self.num_steps = max(self.num_steps, timestep + steps)
+
+    def runs(self, i) -> list[tuple[int, int, int]]:
+        """
+        返回(起点, 终点(不含), 状态)的状态区间列表
+        """
+        starts = self.run_starts[i]
+        ends = list(starts[1:]) + [self.num_steps]
+        return list(zip(starts, ends, self.run_states[i]))
+
+    def expand(self, i) -> list[tuple[int, bool]]:
+        # 展开成逐时间步的(状态, 是否接收)列表，与原state_records_per_recver格式一致
+        records = []
+        for start, end, state in self.runs(i):
+            records.extend([(state, False)] * (end - start))
+        for t in self.recv_timesteps[i]:
+            records[t] = (records[t][0], True)
+        return records
+
+    def nbytes(self) -> int:
+        return sum(
+            a.itemsize * len(a)
+            for arrays in (self.run_starts, self.run_states, self.recv_timesteps)
+            for a in arrays
+        )
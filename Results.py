@@ -0,0 +1,253 @@
+import csv
+import glob
+import importlib.util
+import os
+import time
+from Histogram import merged
+
+# pyarrow导入很慢，这里只检查是否安装，第一次读写parquet时才导入；没有pyarrow时退回到npz或CSV
+HAVE_ARROW = importlib.util.find_spec("pyarrow") is not None
+try:
+    import numpy as np
+
+    _NUMPY_TYPES = {int: np.int64, float: np.float64, str: np.str_}
+except ImportError:
+    np = None
+
+RESULT_FORMATS = ("parquet", "npz", "csv")
+FORMAT_EXT = {"parquet": ".parquet", "npz": ".npz", "csv": ".csv"}
+
+# 表名 -> [(列名, 类型)]，每张表都以run_id开头，由ResultWriter分配
+SCHEMAS = {
+    "runs": [
+        ("run_id", int),
+        ("sim_mode", str),
+        ("num_senders", int),
+        ("num_channels", int),
+        ("num_receivers", int),
+        ("channel_assignment", str),
+        ("switch_time", int),
+        ("dwell_time", int),
+        ("interval", int),
+        ("traffic", str),
+        ("loss_policy", str),
+        ("seed", str),  # 扫描种子是64位无符号整数，未指定时为空
+        ("steps", int),
+        ("total_packets", int),
+        ("received", int),
+        ("lost", int),
+        ("lost_rate", float),
+        ("ci_half_width", float),  # 丢包率95%置信区间半宽，批数不足时为nan
+        ("latency_p50", float),  # 接收延迟（毫秒），没有收到包时为nan
+        ("latency_p99", float),
+        ("latency_p999", float),
+        ("lost_age_p50", float),  # 丢弃时包已滞留的时间（毫秒）
+        ("lost_age_p99", float),
+    ],
+    "channels": [
+        ("run_id", int),
+        ("channel", int),
+        ("total_packets", int),
+        ("received", int),
+        ("lost", int),
+        ("lost_rate", float),
+        ("latency_p50", float),
+        ("latency_p99", float),
+        ("latency_p999", float),
+    ],
+    "senders": [
+        ("run_id", int),
+        ("receiver", int),
+        ("sender_id", int),
+        ("send_times", int),
+        ("last_sent_timestep", int),
+        ("next_send_timestep", int),
+        ("channel_index", int),
+        ("min_interval", int),
+        ("last_interval", int),
+        ("average_interval", float),
+        ("mode_interval", int),
+    ],
+}
+
+
+def default_format() -> str:
+    if HAVE_ARROW:
+        return "parquet"
+    return "npz" if np is not None else "csv"
+
+
+def collect_tables(sim) -> dict:
+    """
+    把一次仿真的结果整理成三张表（不含run_id列），每张表为 列名 -> 值列表
+    """
+    received, lost = sim.packet_totals()
+    total = received + lost
+    ci = sim.ci_half_width()
+    latency, loss_age = sim.latency_totals()
+    runs = {
+        "sim_mode": [sim.sim_mode],
+        "num_senders": [sim.num_senders],
+        "num_channels": [sim.num_channels],
+        "num_receivers": [sim.num_receivers],
+        "channel_assignment": [sim.channel_assignment],
+        "switch_time": [sim.recvers[0].switch_time],
+        "dwell_time": [sim.recvers[0].expected_dwell_time],
+        "interval": [sim.interval],
+        "traffic": [sim.traffic_model],
+        "loss_policy": [sim.channels.loss_policy],
+        "seed": ["" if sim.seed is None else str(sim.seed)],
+        "steps": [sim.cur_timestep],
+        "total_packets": [total],
+        "received": [received],
+        "lost": [lost],
+        "lost_rate": [lost / total if total > 0 else 0.0],
+        "ci_half_width": [ci if ci != float("inf") else float("nan")],
+        "latency_p50": [latency.percentile(50)],
+        "latency_p99": [latency.percentile(99)],
+        "latency_p999": [latency.percentile(99.9)],
+        "lost_age_p50": [loss_age.percentile(50)],
+        "lost_age_p99": [loss_age.percentile(99)],
+    }
+
+    channels = {name: [] for name, _ in SCHEMAS["channels"][1:]}
+    for ch in sim.channels.channels:
+        ch_total = ch.packet_recved + ch.packet_losted
+        channels["channel"].append(ch.channel_index)
+        channels["total_packets"].append(ch_total)
+        channels["received"].append(ch.packet_recved)
+        channels["lost"].append(ch.packet_losted)
+        channels["lost_rate"].append(
+            ch.packet_losted / ch_total if ch_total > 0 else 0.0
+        )
+        ch_latency = merged([ch.recv_latency])
+        for q, name in ((50, "latency_p50"), (99, "latency_p99"), (99.9, "latency_p999")):
+            channels[name].append(ch_latency.percentile(q))
+
+    senders = {name: [] for name, _ in SCHEMAS["senders"][1:]}
+    seen = set()
+    for recver in sim.recvers:
+        # 共享发送者信息的接收机只输出一次
+        if id(recver.senders_info) in seen:
+            continue
+        seen.add(id(recver.senders_info))
+        for info in recver.senders_info.values():
+            senders["receiver"].append(recver.recver_index)
+            senders["sender_id"].append(info.id)
+            senders["send_times"].append(info.send_times)
+            senders["last_sent_timestep"].append(info.last_sent_timestep)
+            senders["next_send_timestep"].append(info.next_send_timestep)
+            senders["channel_index"].append(info.channel_index)
+            senders["min_interval"].append(info.min_interval)
+            senders["last_interval"].append(info.last_interval)
+            senders["average_interval"].append(info.average_interval)
+            senders["mode_interval"].append(info.mode_interval)
+    return {"runs": runs, "channels": channels, "senders": senders}
+
+
+class ResultWriter:
+    """
+    把每次运行的三张结果表追加写入directory/<表名>/下的分片文件，
+    每次运行写完即落盘，目录可以跨多次会话持续追加
+    """
+
+    def __init__(self, directory="sim_results", fmt=None):
+        self.fmt = default_format() if fmt is None else fmt
+        if self.fmt not in RESULT_FORMATS:
+            raise ValueError(f"Unknown result format {self.fmt}")
+        if self.fmt == "parquet" and not HAVE_ARROW:
+            raise ValueError("pyarrow is required for parquet output")
+        if self.fmt == "npz" and np is None:
+            raise ValueError("numpy is required for npz output")
+        self.directory = directory
+        for table in SCHEMAS:
+            os.makedirs(os.path.join(directory, table), exist_ok=True)
+        # 分片文件名前缀：毫秒时间戳+进程号+随机串，同一进程同一毫秒内创建的多个writer也不会重名
+        self._prefix = f"{int(time.time() * 1000)}-{os.getpid()}-{os.urandom(4).hex()}"
+        self._seq = 0
+
+    def write_run(self, sim) -> int:
+        return self.write(collect_tables(sim))
+
+    def write(self, tables: dict) -> int:
+        # tables为collect_tables的返回值，返回分配的run_id
+        # run_id为63位随机数，多个进程同时写同一目录时不需要协调也不会重复
+        run_id = int.from_bytes(os.urandom(8), "little") >> 1
+        for table, columns in tables.items():
+            n = len(next(iter(columns.values())))
+            if n == 0:
+                continue
+            self._write_part(table, {"run_id": [run_id] * n, **columns})
+        self._seq += 1
+        return run_id
+
+    def _write_part(self, table, columns):
+        part = f"part-{self._prefix}-{self._seq:06d}{FORMAT_EXT[self.fmt]}"
+        filename = os.path.join(self.directory, table, part)
+        # 先写临时文件再替换，读取方不会看到写了一半的分片
+        tmp_filename = filename + ".tmp"
+        types = dict(SCHEMAS[table])
+        if self.fmt == "parquet":
+            pa, pq = _arrow()
+            arrow_types = {int: pa.int64(), float: pa.float64(), str: pa.string()}
+            arrays = {
+                name: pa.array(values, arrow_types[types[name]])
+                for name, values in columns.items()
+            }
+            pq.write_table(pa.table(arrays), tmp_filename)
+        elif self.fmt == "npz":
+            arrays = {
+                name: np.asarray(values, _NUMPY_TYPES[types[name]])
+                for name, values in columns.items()
+            }
+            with open(tmp_filename, "wb") as f:
+                np.savez(f, **arrays)
+        else:
+            with open(tmp_filename, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                writer.writerows(zip(*columns.values()))
+        os.replace(tmp_filename, filename)
+
+
+def _arrow():
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    return pa, pq
+
+
+def _parts(directory, table) -> list:
+    files = []
+    for ext in FORMAT_EXT.values():
+        files.extend(glob.glob(os.path.join(directory, table, "part-*" + ext)))
+    return sorted(files)
+
+
+def load_table(directory, table) -> dict:
+    """
+    读取一张表的全部分片，返回 列名 -> 数组（没有numpy时为列表）
+    """
+    files = _parts(directory, table)
+    schema = SCHEMAS[table]
+    if files and files[0].endswith(".parquet"):
+        data = _arrow()[1].ParquetDataset(files).read()
+        return {name: data.column(name).to_numpy() for name, _ in schema}
+    if files and files[0].endswith(".npz"):
+        chunks = [np.load(f) for f in files]
+        return {name: np.concatenate([c[name] for c in chunks]) for name, _ in schema}
+    columns = {name: [] for name, _ in schema}
+    for filename in files:
+        with open(filename, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                for name, kind in schema:
+                    columns[name].append(kind(row[name]))
+    if np is not None:
+        return {
+            name: np.asarray(columns[name], _NUMPY_TYPES[kind]) for name, kind in schema
+        }
+    return columns
+
+
+def load_results(directory="sim_results") -> dict:
+    return {table: load_table(directory, table) for table in SCHEMAS}
@@ -1,6 +1,6 @@
 from Channel import Channel
 from Packet import Packet
-from dbg_print import dbg_print
+from Tracer import tracer, TraceEvent
 
 
 class Sender:
@@ -11,7 +11,7 @@ class Sender:
     def __init__(
         self,
         en: bool,
-        packet_id: str,
+        packet_id: int,
         interval: int,
         last_timestep: int,
         channel: Channel,
@@ -23,21 +23,37 @@ class Sender:
         self.last_timestep = last_timestep
         self.channel: Channel = channel
         self.channel_index = channel_index
-        dbg_print(f"Sender {self.packet_id}: Created in channel {self.channel_index}")
+        if tracer.enabled:
+            tracer.emit(
+                -1,
+                TraceEvent.SENDER_CREATED,
+                channel=self.channel.channel_index,
+                sender=self.packet_id,
+            )
         pass
 
+    def send(self, timestep: int, x=0, y=0):
+        # 由流量生成器决定发送时刻，这里不再检查间隔
+        self.last_timestep = timestep
+        # 每个包带发送时间步，同一发送者的多个包可能同时在信道里排队
+        p = Packet(self.packet_id, x, y, timestep)
+        self.channel.packet_append(p)
+        if tracer.enabled:
+            tracer.emit(
+                timestep,
+                TraceEvent.SEND,
+                channel=self.channel.channel_index,
+                sender=self.packet_id,
+            )
+        return p
+
     def packet_send(self, timestep: int, x=0, y=0):
         if self.en:
             if timestep - self.last_timestep > self.interval:
-                self.last_timestep = timestep
-                p = Packet(self.packet_id, x, y)
-                self.channel.packet_append(p)
-                dbg_print(
-                    f"Sender {self.packet_id}: Send 1 Packet to channel {self.channel_index}"
-                )
-                return p
+                return self.send(timestep, x, y)
             else:
                 # dbg_print("Sender: in interval")
                 pass
         else:
-            dbg_print(f"Sender {self.packet_id}: closed")
+            if tracer.enabled:
+                tracer.emit(timestep, TraceEvent.SENDER_CLOSED, sender=self.packet_id)
@@ -1,17 +1,24 @@
 from datetime import datetime
 import os
+import copy
 import csv
+import gzip
+import pickle
 import random
-from tqdm import tqdm
-from time import sleep
-from Channel import Channels
-from Receiver import Receiver
+import numpy as np
+from time import sleep, perf_counter
+from Channel import ChannelGroup, Channels, assign_channels
+from Receiver import DWELL, SCHEDULE, ChannelRing, Receiver, SenderSchedule, STATE_NAMES
 from Sender import Sender
-import matplotlib.pyplot as plt
+from Recorder import StateRecorder
+from Profiler import PhaseProfiler
+from Convergence import BatchMeans
+from Policy import get_policy, mode_policies
+from Histogram import LogHistogram, merged
+from Traffic import TrafficGenerator
+from Trace import TraceReplay
 from dbg_print import dbg_print
 
-state_map = {"DWELL": 0, "SWITCH": 1, "SCHEDULE": 2, "SWITCH_TO_SCHEDULE": 3}
-
 # "R1-polling-R2-scheduling"
 # or "R1-Rn-both-scheduling-and-polling"
 # or "R1-Rn-polling"
@@ -19,115 +26,418 @@ state_map = {"DWELL": 0, "SWITCH": 1, "SCHEDULE": 2, "SWITCH_TO_SCHEDULE": 3}
 cur_sim_mode = "R1-Rn-both-scheduling-and-polling"
 # cur_sim_mode = "R1-polling-R2-scheduling"
 # cur_sim_mode = "R1-polling-R2-limited-polling"
+# cur_sim_mode = "R1-polling-R2-weighted-polling"
 # cur_sim_mode = "R1-Rn-polling"
 
 OUTPUT_DATA_MODE = "CSV"  # "CSV" or "TERMINAL"
 # OUTPUT_DATA_MODE = "TERMINAL"  # "CSV" or "TERMINAL"
 
+PLOT_MODE = "FILE"  # "FILE"（状态区间抽稀后用Agg保存到TIMELINE_FILE）or "SHOW"（逐毫秒散点，plt.show）
+TIMELINE_FILE = "timeline.png"  # .png or .svg
+
+SIM_ENGINE = "EVENT"  # "EVENT"（跳过空闲时间步）or "TICK"（逐毫秒推进）
+
+# CSV扫描中丢包率95%置信区间半宽小于该值时提前结束，0表示总是跑满total_steps
+STOP_TOLERANCE = 0.002
+
+CHECKPOINT_VERSION = 7
+
 
 class Simulator:
 
-    def __init__(self, num_senders=15):
+    def __init__(
+        self,
+        num_senders=15,
+        seed=None,
+        record_mode="FULL",
+        loss_policy="DROP_ONE",
+        profile_every=0,
+        sim_mode=None,
+        policies=None,
+        num_channels=40,
+        num_receivers=2,
+        channel_switch_time=5,
+        channel_dwell_time=220,
+        interval=200,
+        channel_assignment=None,
+        traffic="PERIODIC",
+        traffic_options=None,
+        trace=None,
+    ):
         self.cur_timestep = 0  # ms
+        self.sim_mode = cur_sim_mode if sim_mode is None else sim_mode
+        # profile_every>0时每隔这么多时间步采样一次各阶段耗时
+        self.profiler = PhaseProfiler(profile_every) if profile_every > 0 else None
+        # 按批统计丢包率，首次run时创建
+        self.batch_means = None
+        # 指定seed时使用独立的随机数发生器，否则沿用全局random
+        self.seed = seed
+        self.rng = random.Random(seed) if seed is not None else random
+        # 指定抓包轨迹文件时回放轨迹中的到达，发送者和信道数由轨迹决定
+        self.trace = trace
+        replay = TraceReplay(trace) if trace is not None else None
+        if replay is not None:
+            num_senders = replay.num_senders
+            num_channels = max(num_channels, replay.num_channels)
+            traffic = "TRACE"
 
-        self.num_channels = 40
-        self.num_receivers = 2
+        self.num_channels = num_channels
+        self.num_receivers = num_receivers
         self.num_senders = num_senders
-        channels_per_receiver = self.num_channels // self.num_receivers
+        self.interval = interval
+        # 流量模型，见Traffic.TRAFFIC_MODELS
+        self.traffic_model = traffic
+        self.traffic_options = traffic_options
+
+        self.uni_sender_info = SenderSchedule()  # 共享发送者信息
+        self.uni_senders_channel_index = ChannelRing()  # 共享发送者信道索引
 
-        self.uni_sender_info = {}  # 共享发送者信息
-        self.uni_senders_channel_index = []  # 共享发送者信道索引
+        # 信道分配：默认调度+轮询模式按连续分块，其余模式每个接收机管理全部信道
+        if channel_assignment is None:
+            channel_assignment = (
+                "CONTIGUOUS"
+                if self.sim_mode == "R1-Rn-both-scheduling-and-polling"
+                else "ALL"
+            )
+        if channel_assignment != "ALL" and self.sim_mode in (
+            "R1-polling-R2-scheduling",
+            "R1-polling-R2-limited-polling",
+            "R1-polling-R2-weighted-polling",
+        ):
+            # 共享的发送者信息按组内信道序号记录，要求各接收机的信道组相同
+            raise ValueError(f"{self.sim_mode} requires channel_assignment='ALL'")
+        self.channel_assignment = channel_assignment
+        channel_groups = assign_channels(
+            self.num_channels, self.num_receivers, channel_assignment
+        )
+        if not all(channel_groups):
+            raise ValueError("Every receiver needs at least one channel")
 
-        self.channels = Channels(num_channels=self.num_channels)
+        self.channels = Channels(
+            num_channels=self.num_channels, loss_policy=loss_policy
+        )
 
         self.recvers = [
             Receiver(
-                channels=(
-                    self.channels.channels[
-                        i * channels_per_receiver : (i + 1) * channels_per_receiver
-                    ]
-                    if cur_sim_mode == "R1-Rn-both-scheduling-and-polling"
-                    else self.channels.channels
-                ),
+                channels=ChannelGroup(self.channels, channel_groups[i]),
                 index=i,
-                channel_switch_time=5,
-                channel_dwell_time=220,
+                channel_switch_time=channel_switch_time,
+                channel_dwell_time=channel_dwell_time,
                 uni_sender_info=(
                     # 一个轮询一个调度时，共享发送者信息，否则各自维护
                     self.uni_sender_info
-                    if cur_sim_mode == "R1-polling-R2-scheduling"
+                    if self.sim_mode == "R1-polling-R2-scheduling"
                     else None
                 ),
                 uni_senders_channel_index=(
-                    # 仅在R1-polling-R2-limited-polling模式下共享发送者信道索引
+                    # 仅在R1-polling-R2-limited/weighted-polling模式下共享发送者信道索引
                     self.uni_senders_channel_index
-                    if cur_sim_mode == "R1-polling-R2-limited-polling"
+                    if self.sim_mode
+                    in ("R1-polling-R2-limited-polling", "R1-polling-R2-weighted-polling")
                     else None
                 ),
             )
             for i in range(self.num_receivers)
         ]
 
+        # 各接收机的接收策略，默认由仿真模式决定，也可用policies逐个指定策略名
+        self.policy_names = (
+            mode_policies(self.sim_mode, self.num_receivers)
+            if policies is None
+            else list(policies)
+        )
+        if len(self.policy_names) != self.num_receivers:
+            raise ValueError(f"Expected {self.num_receivers} receiver policies")
+        self._bind_policies()
+
         self.senders: list[Sender] = []
-        for i in range(num_senders):
-            channel_index = random.randint(
-                0, self.channels.channels.__len__() - 1
-            )  # 频道索引是0~39
+        # 发送者使用整数编号，显示名称单独保存
+        self.sender_names: list[str] = []
+        if replay is not None:
+            for i, (name, channel_index) in enumerate(
+                zip(replay.sender_names, replay.first_channels)
+            ):
+                self.senders.append(
+                    Sender(
+                        en=True,
+                        packet_id=i,
+                        interval=interval,
+                        last_timestep=0,
+                        channel=self.channels.get_ch(channel_index),
+                        channel_index=channel_index,
+                    )
+                )
+                self.sender_names.append(name)
+            self.traffic = replay
+        for i in range(num_senders if replay is None else 0):
+            channel_index = self.rng.randint(
+                0, self.num_channels - 1
+            )  # 频道索引是0~num_channels-1
             sender = Sender(
                 en=True,
-                packet_id=f"SENDER_ID_{i}",
-                interval=200,
-                last_timestep=random.randint(0, 200),
+                packet_id=i,
+                interval=interval,
+                last_timestep=self.rng.randint(0, interval),
                 channel=self.channels.get_ch(channel_index),
                 channel_index=channel_index,
             )
             self.senders.append(sender)
+            self.sender_names.append(f"SENDER_ID_{i}")
+        if replay is None:
+            # 预先生成的发送时刻流，起始相位沿用上面的last_timestep
+            self.traffic = TrafficGenerator(
+                self.senders,
+                model=traffic,
+                rng=np.random.default_rng(self.rng.getrandbits(64)),
+                options=traffic_options,
+            )
+
+        # 状态时序记录："OFF" / "TRANSITIONS" / "FULL"
+        self.recorder = StateRecorder(self.num_receivers, mode=record_mode)
+
+    @property
+    def state_records_per_recver(self):
+        # 按需从游程编码展开成逐时间步的(状态, 是否接收)列表
+        return [self.recorder.expand(i) for i in range(self.num_receivers)]
+
+    def _bind_policies(self):
+        # 初始化时一次性解析策略，内层循环直接调用绑定好的step
+        policies = [get_policy(name) for name in self.policy_names]
+        self.recv_steps = [p.bind(r) for p, r in zip(policies, self.recvers)]
+        # (是否轮询驻留, 是否扫描计划发送者)，供事件引擎预测和跳过空闲时间步
+        self.recv_modes = [(p.polling, p.scheduling) for p in policies]
+
+    def _tick(self, senders):
+        if self.profiler is not None and self.profiler.should_sample():
+            self._tick_profiled(senders)
+            return
+        for s in senders:
+            s.send(self.cur_timestep)
+        recorder = self.recorder if self.recorder.enabled else None
+        for i, step in enumerate(self.recv_steps):
+            result = step(self.cur_timestep)
+            # 状态记录，用于显示时序图
+            if recorder:
+                recorder.record(
+                    i, self.cur_timestep, result[0], result[1]
+                )
+
+        self.channels.all_channel_lost(self.cur_timestep)
 
-        self.state_records_per_recver = [[] for _ in range(self.num_receivers)]
+    def _tick_profiled(self, senders):
+        # 与_tick相同，逐阶段计时
+        profiler = self.profiler
+        start = perf_counter()
+        for s in senders:
+            s.send(self.cur_timestep)
+        profiler.add("senders", start)
+        recorder = self.recorder if self.recorder.enabled else None
+        for i, step in enumerate(self.recv_steps):
+            state = STATE_NAMES[self.recvers[i].state]
+            start = perf_counter()
+            result = step(self.cur_timestep)
+            profiler.add_receiver(i, state, start)
+            profiler.add("receivers", start)
+            if recorder:
+                start = perf_counter()
+                recorder.record(
+                    i, self.cur_timestep, result[0], result[1]
+                )
+                profiler.add("recording", start)
+        start = perf_counter()
+        self.channels.all_channel_lost(self.cur_timestep)
+        profiler.add("loss", start)
 
-    def run(self, step_limit=-1):
-        senders = self.senders
-        if step_limit > 0:
-            pbar = tqdm(total=step_limit, desc=f"Sim(senders={self.num_senders})")
+    def _update_pbar(self, pbar, steps):
+        if self.profiler is not None and self.profiler.sampling:
+            start = perf_counter()
+            pbar.update(steps)
+            self.profiler.add("progress", start)
+        else:
+            pbar.update(steps)
+
+    def run(
+        self,
+        step_limit=-1,
+        progress=True,
+        checkpoint_every=0,
+        checkpoint_file=None,
+        tolerance=0.0,
+        batch_steps=60 * 1000,
+        min_batches=10,
+    ):
+        """
+        checkpoint_every>0时，每隔这么多仿真毫秒把完整状态保存到checkpoint_file，
+        之后可用Simulator.load_checkpoint恢复并继续run
+        每batch_steps个时间步统计一批丢包率（批均值法），tolerance>0时，
+        至少min_batches批且丢包率95%置信区间半宽小于tolerance后提前结束，step_limit为上限
+        """
+        engine = self.run_events if SIM_ENGINE == "EVENT" else self.run_ticks
+        if batch_steps > 0 and self.batch_means is None:
+            self.batch_means = BatchMeans(batch_steps, min_batches)
+        batch_steps = self.batch_means.batch_steps if self.batch_means else 0
+        pbar = None
+        if progress and step_limit > 0:
+            # 进度条和绘图库只在用到时导入，无界面的批量进程不必加载
+            from tqdm import tqdm
+
+            pbar = tqdm(
+                total=step_limit,
+                initial=self.cur_timestep,
+                desc=f"Sim(senders={self.num_senders})",
+            )
+        if checkpoint_every > 0 or batch_steps > 0:
+            # 分段运行，段边界为检查点和批的边界
+            periods = [p for p in (checkpoint_every, batch_steps) if p > 0]
+            while step_limit == -1 or self.cur_timestep < step_limit:
+                boundary = min((self.cur_timestep // p + 1) * p for p in periods)
+                engine(boundary if step_limit == -1 else min(boundary, step_limit), pbar)
+                stop = False
+                if batch_steps > 0 and self.cur_timestep % batch_steps == 0:
+                    self.batch_means.add_batch(*self.packet_totals())
+                    stop = tolerance > 0 and self.batch_means.converged(tolerance)
+                if checkpoint_every > 0 and (
+                    stop
+                    or self.cur_timestep % checkpoint_every == 0
+                    or self.cur_timestep == step_limit
+                ):
+                    self.save_checkpoint(checkpoint_file)
+                if stop:
+                    break
+        else:
+            engine(step_limit, pbar)
+        if pbar is not None:
+            pbar.close()
+            # sleep(0.1)
+
+    def _due_senders(self, timestep) -> list[Sender]:
+        # timestep时刻要发包的发送者，按编号升序
+        if self.trace is None:
+            return [self.senders[i] for i in self.traffic.pop_due(timestep)]
+        # 轨迹回放：发送者按记录里的信道发包，信道变化时跟着切换
+        due = []
+        seen = set()
+        for i, channel_index in self.traffic.pop_due(timestep):
+            s = self.senders[i]
+            if s.channel_index != channel_index:
+                if i in seen:
+                    # 同一时间步在多个信道上出现，用副本发送，不影响已排队的那次
+                    s = copy.copy(s)
+                s.channel_index = channel_index
+                s.channel = self.channels.get_ch(channel_index)
+            seen.add(i)
+            due.append(s)
+        return due
+
+    def run_ticks(self, step_limit=-1, pbar=None):
         while step_limit == -1 or self.cur_timestep < step_limit:
             # dbg_print(f"Simulator: timestep--------{self.cur_timestep}---------")
-            for s in senders:
-                s.packet_send(timestep=self.cur_timestep)
-            for i, recver in enumerate(self.recvers):
-                result = None
-                if cur_sim_mode == "R1-polling-R2-scheduling":
-                    result = (
-                        recver.packet_recv(
-                            cur_timestep=self.cur_timestep, just_polling=True
-                        )
-                        if i == 0
-                        else recver.packet_schedule_recv(cur_timestep=self.cur_timestep)
-                    )
-                elif cur_sim_mode == "R1-Rn-polling":
-                    result = recver.packet_recv(
-                        cur_timestep=self.cur_timestep, just_polling=True
-                    )
-                elif cur_sim_mode == "R1-Rn-both-scheduling-and-polling":
-                    result = recver.packet_recv(
-                        cur_timestep=self.cur_timestep, just_polling=False
-                    )
-                elif cur_sim_mode == "R1-polling-R2-limited-polling":
-                    result = recver.packet_recv(
-                        cur_timestep=self.cur_timestep,
-                        just_polling=True,
-                        limited_polling=True if i == 1 else False,
+            self._tick(self._due_senders(self.cur_timestep))
+            self.cur_timestep += 1
+            if pbar is not None:
+                self._update_pbar(pbar, 1)
+
+    def _skip_idle(self, steps):
+        # 空闲时间步内各接收机只推进计时器，状态记录按原样补齐
+        if steps <= 0:
+            return
+        if self.profiler is not None and self.profiler.sampling:
+            start = perf_counter()
+            self._skip_receivers(steps)
+            self.profiler.add("skip", start)
+        else:
+            self._skip_receivers(steps)
+        self.cur_timestep += steps
+
+    def _skip_receivers(self, steps):
+        for i, recver in enumerate(self.recvers):
+            recver.fast_forward(
+                steps, polling=self.recv_modes[i][0], cur_timestep=self.cur_timestep
+            )
+            if self.recorder.enabled:
+                self.recorder.record_span(
+                    i, self.cur_timestep, steps, recver.state
+                )
+
+    def run_events(self, step_limit=-1, pbar=None):
+        """
+        事件驱动版本的run：时钟直接跳到下一个发送、接收机计时器到期、
+        计划扫描或丢包事件，结果与run_ticks逐毫秒推进完全一致
+        """
+        modes = self.recv_modes
+        traffic = self.traffic
+        profiler = self.profiler
+        while step_limit == -1 or self.cur_timestep < step_limit:
+            if profiler is not None and profiler.sampling:
+                start = perf_counter()
+            # 信道里还有包或本时间步有发送时，下一时间步必须处理，不用再询问各接收机
+            next_send = traffic.next_timestep()
+            if self.channels.busy or next_send <= self.cur_timestep:
+                next_timestep = self.cur_timestep
+            else:
+                next_timestep = next_send
+                for recver, (polling, scheduling) in zip(self.recvers, modes):
+                    recver_next = recver.next_event_timestep(
+                        self.cur_timestep - 1, polling, scheduling
                     )
-                # 状态记录，用于显示时序图
-                state = state_map[result[0]]
-                self.state_records_per_recver[i].append((state, result[1]))
+                    if recver_next < next_timestep:
+                        next_timestep = recver_next
+                        if next_timestep <= self.cur_timestep:
+                            break
+            if step_limit > 0 and next_timestep >= step_limit:
+                next_timestep = step_limit
+            if profiler is not None and profiler.sampling:
+                profiler.add("next_event", start)
+            if next_timestep == float("inf"):
+                break  # 无限运行且不会再有任何事件
+            steps = next_timestep - self.cur_timestep
+            self._skip_idle(steps)
+            if pbar is not None:
+                self._update_pbar(pbar, steps)
+            if step_limit > 0 and self.cur_timestep >= step_limit:
+                break
 
-            self.channels.all_channel_lost()
+            self._tick(self._due_senders(self.cur_timestep))
             self.cur_timestep += 1
-            if step_limit > 0:
-                pbar.update(1)
-        if step_limit > 0:
-            pbar.close()
-            # sleep(0.1)
+            if pbar is not None:
+                self._update_pbar(pbar, 1)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.rng is random:
+            # 使用全局random时保存其状态
+            state["rng"] = None
+            state["global_rng_state"] = random.getstate()
+        return state
+
+    def __setstate__(self, state):
+        global_rng_state = state.pop("global_rng_state", None)
+        self.__dict__.update(state)
+        if global_rng_state is not None:
+            random.setstate(global_rng_state)
+            self.rng = random
+
+    def save_checkpoint(self, filename="sim_checkpoint.pkl.gz"):
+        # 先写临时文件再替换，进程中途被杀也不会留下损坏的检查点
+        tmp_filename = filename + ".tmp"
+        with gzip.open(tmp_filename, "wb", compresslevel=1) as f:
+            pickle.dump(
+                {"version": CHECKPOINT_VERSION, "simulator": self},
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp_filename, filename)
+
+    @classmethod
+    def load_checkpoint(cls, filename="sim_checkpoint.pkl.gz") -> "Simulator":
+        """
+        每次加载都得到一个独立的Simulator，可以从同一个预热检查点分叉出多个参数变体
+        """
+        with gzip.open(filename, "rb") as f:
+            checkpoint = pickle.load(f)
+        if checkpoint.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version in {filename}")
+        return checkpoint["simulator"]
 
     def summary(self):
         total_packets = 0
@@ -143,13 +453,26 @@ class Simulator:
         print(f"    Received     : {received}")
         print(f"    Lost         : {losted}")
         print(f"    Lost rate    : {lost_rate:.2f}%")
+        latency, loss_age = self.latency_totals()
+        print(f"    Latency      : {latency.summary()}")
+        print(f"    Lost age     : {loss_age.summary()}")
 
         print("\nPer-channel details:")
-        for i, ch in enumerate(self.channels.channels):
+        # 只列出用到过的信道，其余信道没有任何收发
+        for ch in self.channels.channels:
             ch_total = ch.packet_recved + ch.packet_losted
             ch_lost_rate = ((ch.packet_losted / ch_total) * 100) if ch_total > 0 else 0
             print(
-                f"  Channel {i}: total={ch_total}, received={ch.packet_recved}, lost={ch.packet_losted}, lost rate={ch_lost_rate:.2f}%"
+                f"  Channel {ch.channel_index}: total={ch_total}, received={ch.packet_recved}, lost={ch.packet_losted}, lost rate={ch_lost_rate:.2f}%, "
+                f"latency {merged([ch.recv_latency]).summary()}"
+            )
+
+        print("\nPer-receiver latency:")
+        for recver in self.recvers:
+            print(
+                f"  Receiver {recver.recver_index}: "
+                f"DWELL({recver.latency[DWELL].count}) {recver.latency[DWELL].summary()}; "
+                f"SCHEDULE({recver.latency[SCHEDULE].count}) {recver.latency[SCHEDULE].summary()}"
             )
 
         sender_infos = []
@@ -165,7 +488,7 @@ class Simulator:
         ]
         table_data = [
             [
-                info.id,
+                self.sender_names[info.id],
                 info.last_sent_timestep,
                 str(info.send_times),
                 f"{info.last_interval:.2f}",
@@ -183,6 +506,18 @@ class Simulator:
             for row in table_data:
                 f.write("| " + " | ".join(str(item) for item in row) + " |\n")
 
+        if not self.recorder.enabled:
+            print("")
+            return
+        if PLOT_MODE == "FILE":
+            from Timeline import render_timeline
+
+            render_timeline(self.recorder, TIMELINE_FILE)
+            print(f"\nTimeline written to {TIMELINE_FILE}\n")
+            return
+
+        import matplotlib.pyplot as plt
+
         for i, state_records in enumerate(self.state_records_per_recver):
             time_list = list(range(len(state_records)))
             states = []
@@ -211,9 +546,7 @@ class Simulator:
                 label=f"RECVED {i}",
             )
 
-            plt.yticks(
-                [0, 1, 2, 3], ["DWELL", "SWITCH", "SCHEDULE", "SWITCH_TO_SCHEDULE"]
-            )
+            plt.yticks(range(len(STATE_NAMES)), STATE_NAMES)
             plt.xlabel("Timestep (ms)")
             plt.ylabel("State")
             plt.title(f"Receiver {i} State Sequence over Time")
@@ -227,38 +560,52 @@ class Simulator:
         plt.show()
         print("")
 
-    def append_results_to_csv(self, filename="sim_result.csv"):
-        # 1. 总体数据统计
-        total_packets = 0
+    def packet_totals(self) -> tuple[int, int]:
+        # (累计接收包数, 累计丢包数)
         received = 0
         losted = 0
         for ch in self.channels.channels:
             received += ch.packet_recved
             losted += ch.packet_losted
+        return received, losted
+
+    def latency_totals(self) -> tuple[LogHistogram, LogHistogram]:
+        # (全部信道的接收延迟, 丢弃时的滞留时间)
+        channels = self.channels.channels
+        return (
+            merged(ch.recv_latency for ch in channels),
+            merged(ch.loss_age for ch in channels),
+        )
+
+    def ci_half_width(self) -> float:
+        # 丢包率95%置信区间半宽，批数不足时为inf
+        return self.batch_means.half_width() if self.batch_means else float("inf")
+
+    def result_row(self) -> list:
+        # 1. 总体数据统计，之后为实际运行的时间步数、丢包率置信区间半宽、接收延迟p50/p99/p999（毫秒）
+        received, losted = self.packet_totals()
+        latency = self.latency_totals()[0]
         total_packets = received + losted
         lost_rate = (losted / total_packets * 100) if total_packets > 0 else 0
-        # 2. 按信道统计
-        channel_rows = []
-        for i, ch in enumerate(self.channels.channels):
-            ch_total = ch.packet_recved + ch.packet_losted
-            ch_lost_rate = ((ch.packet_losted / ch_total) * 100) if ch_total > 0 else 0
-            channel_rows.append(
-                [
-                    i,
-                    ch_total,
-                    ch.packet_recved,
-                    ch.packet_losted,
-                    f"{ch_lost_rate:.2f}%",
-                ]
-            )
-        # 3. 文件是否已存在，决定是否写入表头
-        file_exists = os.path.isfile(filename)
-        # 4. 写CSV
+        ci = self.ci_half_width()
+        return [
+            self.num_senders,
+            total_packets,
+            received,
+            losted,
+            f"{lost_rate:.2f}%",
+            self.cur_timestep,
+            f"{ci * 100:.3f}%" if ci != float("inf") else "",
+        ] + [
+            f"{latency.percentile(q):.0f}" if latency.count else ""
+            for q in (50, 99, 99.9)
+        ]
+
+    def append_results_to_csv(self, filename="sim_result.csv"):
+        # 只追加总体统计；按信道、按发送者的明细用Results.ResultWriter输出
         with open(filename, "a", newline="", encoding="utf-8") as csvfile:
             writer = csv.writer(csvfile)
-            writer.writerow(
-                [self.num_senders, total_packets, received, losted, f"{lost_rate:.2f}%"]
-            )
+            writer.writerow(self.result_row())
 
 
 if __name__ == "__main__":
@@ -277,11 +624,17 @@ if __name__ == "__main__":
             os.remove(CSV_FILENAME)
         total_steps = 30 * 60 * 1000
 
-        for num_senders in range(1, 41):  # 1~40
-            dbg_print(f"Running simulation with {num_senders} sender(s)...")
-            sim = Simulator(num_senders=num_senders)
-            sim.run(step_limit=total_steps)
-            sim.append_results_to_csv(CSV_FILENAME)
+        from Sweep import run_sweep
+
+        # 1~40个发送者的仿真分发到进程池并行运行，结果按扫描顺序写入CSV
+        run_sweep(
+            range(1, 41),
+            step_limit=total_steps,
+            filename=CSV_FILENAME,
+            sim_mode=cur_sim_mode,
+            engine=SIM_ENGINE,
+            tolerance=STOP_TOLERANCE,
+        )
         dbg_print("All simulations finished. Results written to", CSV_FILENAME)
 
 
@@ -0,0 +1,322 @@
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import sys
+import Simulator
+from Results import RESULT_FORMATS, ResultWriter, collect_tables
+from dbg_print import dbg_print
+
+# 参数网格的键及默认值，网格文件中每个键可以是单个值或列表
+GRID_DEFAULTS = {
+    "mode": Simulator.cur_sim_mode,
+    "senders": 15,
+    "receivers": 2,
+    "channels": 40,
+    "assignment": None,  # 信道分配方式，None为仿真模式的默认分配
+    "switch_time": 5,
+    "dwell_time": 220,
+    "interval": 200,
+    "traffic": "PERIODIC",  # 流量模型，见Traffic.TRAFFIC_MODELS
+    "traffic_options": None,  # 流量模型参数，如 {"jitter": 10}
+    "loss_policy": "DROP_ONE",
+    "seeds": 0,
+    "steps": 30 * 60 * 1000,
+    "tolerance": 0.0,  # 丢包率置信区间半宽，>0时提前结束
+}
+RESULT_COLUMNS = [
+    "total_packets",
+    "received",
+    "lost",
+    "lost_rate",
+    "steps_used",
+    "ci_half_width",
+    "latency_p50",
+    "latency_p99",
+    "latency_p999",
+]
+# 影响仿真结果的源文件，内容变化后缓存自动失效
+# Convergence决定tolerance>0时何时停止，Sweep本身决定各扫描点的种子和参数
+SIM_SOURCES = (
+    "Simulator.py",
+    "Receiver.py",
+    "Channel.py",
+    "Sender.py",
+    "Packet.py",
+    "Policy.py",
+    "Traffic.py",
+    "Histogram.py",
+    "Convergence.py",
+    "Sweep.py",
+)
+
+
+def sweep_seed(base_seed: int, num_senders: int) -> int:
+    """
+    每个扫描点独立且确定的随机种子，与运行顺序和进程分配无关
+    """
+    digest = hashlib.sha256(f"{base_seed}:{num_senders}".encode()).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def run_one(
+    num_senders,
+    step_limit,
+    seed,
+    sim_mode,
+    engine,
+    profile_every=0,
+    collect_results=False,
+    tolerance=0.0,
+):
+    # 子进程中重新导入的Simulator模块使用默认全局配置，这里显式设置
+    Simulator.cur_sim_mode = sim_mode
+    Simulator.SIM_ENGINE = engine
+    dbg_print(f"Running simulation with {num_senders} sender(s)...")
+    # CSV只需要统计结果，不记录状态时序
+    sim = Simulator.Simulator(
+        num_senders=num_senders,
+        seed=seed,
+        record_mode="OFF",
+        profile_every=profile_every,
+    )
+    sim.run(step_limit=step_limit, progress=False, tolerance=tolerance)
+    profile = sim.profiler.report() if sim.profiler else None
+    tables = collect_tables(sim) if collect_results else None
+    return sim.result_row(), profile, tables
+
+
+def run_sweep(
+    sender_counts,
+    step_limit,
+    filename="sim_result.csv",
+    base_seed=0,
+    max_workers=None,
+    sim_mode=None,
+    engine=None,
+    profile_every=0,
+    results_dir=None,
+    results_format=None,
+    tolerance=0.0,
+):
+    """
+    并行运行一组发送者数量的仿真，按sender_counts的顺序追加写入CSV
+    tolerance>0时各次运行在丢包率置信区间足够窄后提前结束（见Simulator.run）
+    profile_every>0时，各次运行的分阶段耗时写入CSV同名的_profile.json
+    results_dir不为None时，每次运行的明细表同时追加写入该目录（见Results.ResultWriter）
+    """
+    # 进程池和进度条只有主进程需要，工作进程导入本模块时不必加载
+    from concurrent.futures import ProcessPoolExecutor
+    from tqdm import tqdm
+
+    sender_counts = list(sender_counts)
+    sim_mode = Simulator.cur_sim_mode if sim_mode is None else sim_mode
+    engine = Simulator.SIM_ENGINE if engine is None else engine
+    if max_workers is None:
+        max_workers = min(os.cpu_count() or 1, len(sender_counts)) or 1
+    n = len(sender_counts)
+    results_writer = (
+        ResultWriter(results_dir, results_format) if results_dir is not None else None
+    )
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # map按提交顺序返回结果，先完成的结果会等前面的写完
+        results = executor.map(
+            run_one,
+            sender_counts,
+            [step_limit] * n,
+            [sweep_seed(base_seed, c) for c in sender_counts],
+            [sim_mode] * n,
+            [engine] * n,
+            [profile_every] * n,
+            [results_writer is not None] * n,
+            [tolerance] * n,
+        )
+        profiles = []
+        with open(filename, "a", newline="", encoding="utf-8") as csvfile:
+            writer = csv.writer(csvfile)
+            for row, profile, tables in tqdm(results, total=n, desc="Sweep"):
+                writer.writerow(row)
+                csvfile.flush()
+                if tables is not None:
+                    results_writer.write(tables)
+                if profile is not None:
+                    profiles.append({"num_senders": row[0], **profile})
+    if profiles:
+        profile_filename = os.path.splitext(filename)[0] + "_profile.json"
+        with open(profile_filename, "w", encoding="utf-8") as f:
+            json.dump(profiles, f, indent=2)
+
+
+def load_grid(filename) -> dict:
+    with open(filename, encoding="utf-8") as f:
+        if filename.endswith((".yaml", ".yml")):
+            try:
+                import yaml  # 只有YAML参数网格才需要，工作进程不必加载
+            except ImportError:
+                raise ValueError("PyYAML is required to read YAML grids")
+            return yaml.safe_load(f) or {}
+        return json.load(f)
+
+
+def expand_grid(grid: dict) -> list[dict]:
+    """
+    展开参数网格为扫描点列表，按GRID_DEFAULTS的键顺序做笛卡尔积，未给出的键取默认值
+    """
+    unknown = set(grid) - set(GRID_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown grid keys {sorted(unknown)}")
+    axes = []
+    for key, default in GRID_DEFAULTS.items():
+        values = grid.get(key, default)
+        axes.append(values if isinstance(values, list) else [values])
+    return [dict(zip(GRID_DEFAULTS, point)) for point in itertools.product(*axes)]
+
+
+def code_version() -> str:
+    digest = hashlib.sha256()
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in SIM_SOURCES:
+        with open(os.path.join(here, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def config_key(config: dict, version: str) -> str:
+    text = json.dumps({"config": config, "code": version}, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def run_point(config, engine, collect_results=False) -> tuple:
+    Simulator.SIM_ENGINE = engine
+    sim = Simulator.Simulator(
+        num_senders=config["senders"],
+        # 种子只由seeds和发送者数量决定，不同算法参数下发送者布局相同
+        seed=sweep_seed(config["seeds"], config["senders"]),
+        record_mode="OFF",
+        loss_policy=config["loss_policy"],
+        sim_mode=config["mode"],
+        num_channels=config["channels"],
+        num_receivers=config["receivers"],
+        channel_assignment=config["assignment"],
+        channel_switch_time=config["switch_time"],
+        channel_dwell_time=config["dwell_time"],
+        interval=config["interval"],
+        traffic=config["traffic"],
+        traffic_options=config["traffic_options"],
+    )
+    sim.run(step_limit=config["steps"], progress=False, tolerance=config["tolerance"])
+    tables = collect_tables(sim) if collect_results else None
+    return sim.result_row()[1:], tables
+
+
+class ResultCache:
+    """
+    以配置+代码版本的哈希为文件名的结果缓存，每个扫描点一个JSON文件
+    """
+
+    def __init__(self, cache_dir=".sweep_cache"):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)["row"]
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, config, version, row):
+        # 先写临时文件再替换，中断时不会留下不完整的缓存
+        tmp_path = self._path(key) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "code_version": version, "row": row}, f)
+        os.replace(tmp_path, self._path(key))
+
+
+def run_grid(
+    points,
+    filename="sweep_grid.csv",
+    cache_dir=".sweep_cache",
+    max_workers=None,
+    engine=None,
+    results_dir=None,
+    results_format=None,
+) -> int:
+    """
+    运行参数网格中缓存未命中的扫描点，按网格顺序把全部结果写入CSV，返回实际运行的点数
+    results_dir不为None时，实际运行的点的明细表追加写入该目录，命中缓存的点不再重复写入
+    """
+    # 进程池和进度条只有主进程需要，工作进程导入本模块时不必加载
+    from concurrent.futures import ProcessPoolExecutor
+    from tqdm import tqdm
+
+    engine = Simulator.SIM_ENGINE if engine is None else engine
+    version = code_version()
+    cache = ResultCache(cache_dir)
+    keys = [config_key(point, version) for point in points]
+    rows = [cache.get(key) for key in keys]
+    missing = [i for i, row in enumerate(rows) if row is None]
+    print(f"{len(points)} points, {len(points) - len(missing)} cached, {len(missing)} to run")
+    results_writer = (
+        ResultWriter(results_dir, results_format) if results_dir is not None else None
+    )
+    if missing:
+        if max_workers is None:
+            max_workers = min(os.cpu_count() or 1, len(missing))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(
+                run_point,
+                [points[i] for i in missing],
+                [engine] * len(missing),
+                [results_writer is not None] * len(missing),
+            )
+            for i, (row, tables) in tqdm(
+                zip(missing, results), total=len(missing), desc="Sweep"
+            ):
+                # 每完成一个点就写入缓存，中断后重跑只需补齐剩下的点
+                cache.put(keys[i], points[i], version, row)
+                rows[i] = row
+                if tables is not None:
+                    results_writer.write(tables)
+    with open(filename, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(list(GRID_DEFAULTS) + RESULT_COLUMNS)
+        for point, row in zip(points, rows):
+            writer.writerow(list(point.values()) + row)
+    return len(missing)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a parameter grid sweep")
+    parser.add_argument("grid", help="YAML or JSON parameter grid")
+    parser.add_argument("--output", default="sweep_grid.csv")
+    parser.add_argument("--cache-dir", default=".sweep_cache")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--engine", default=Simulator.SIM_ENGINE)
+    parser.add_argument(
+        "--results-dir", default=None, help="also stream per-run detail tables here"
+    )
+    parser.add_argument("--results-format", choices=RESULT_FORMATS, default=None)
+    args = parser.parse_args(argv)
+
+    points = expand_grid(load_grid(args.grid))
+    run_grid(
+        points,
+        filename=args.output,
+        cache_dir=args.cache_dir,
+        max_workers=args.workers,
+        engine=args.engine,
+        results_dir=args.results_dir,
+        results_format=args.results_format,
+    )
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
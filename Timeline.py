@@ -0,0 +1,117 @@
+import argparse
+import sys
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from Receiver import STATE_NAMES
+
+RECV_ROW = len(STATE_NAMES)  # 接收事件画在状态行上方
+RECV_COLOR = "red"
+# 状态编号 -> 颜色，跳过与接收事件相近的C3（红色）
+STATE_COLORS = ("C0", "C1", "C2", "C4")
+
+
+def _window_runs(recorder, i, start, end):
+    # 二分找出与[start, end)相交的游程，窗口外的数据不参与计算
+    starts = np.frombuffer(recorder.run_starts[i], dtype=np.int64)
+    states = np.frombuffer(recorder.run_states[i], dtype=np.int8)
+    ends = np.append(starts[1:], recorder.num_steps)
+    lo = np.searchsorted(ends, start, side="right")
+    hi = np.searchsorted(starts, end, side="left")
+    return (
+        np.clip(starts[lo:hi], start, end),
+        np.clip(ends[lo:hi], start, end),
+        states[lo:hi],
+    )
+
+
+def decimate_runs(run_starts, run_ends, start, bin_size) -> list[tuple[float, float]]:
+    """
+    把同一状态的游程按像素合并：落在同一个或相邻像素里的游程合成一段，
+    返回broken_barh用的(起点, 长度)列表，段数不超过像素数
+    """
+    if not len(run_starts):
+        return []
+    p0 = np.floor((run_starts - start) / bin_size)
+    p1 = np.floor((run_ends - 1 - start) / bin_size) + 1
+    reach = np.maximum.accumulate(p1)
+    # 游程按时间排序，起点像素超过此前所有游程的最远像素时开始新的一段
+    new = np.flatnonzero(p0[1:] > reach[:-1]) + 1
+    first = np.concatenate(([0], new))
+    last = np.concatenate((new - 1, [len(p0) - 1]))
+    return [
+        (start + a * bin_size, (b - a) * bin_size)
+        for a, b in zip(p0[first], reach[last])
+    ]
+
+
+def render_timeline(
+    recorder,
+    filename="timeline.png",
+    start=0,
+    end=None,
+    receivers=None,
+    width_px=1600,
+    dpi=100,
+):
+    """
+    用Agg后端把接收机状态时序画成区间段+接收事件栅格，直接保存为PNG/SVG（按扩展名）
+    start/end为时间窗口（毫秒），只取窗口内的游程，按width_px像素抽稀
+    """
+    end = recorder.num_steps if end is None else min(end, recorder.num_steps)
+    if end <= start:
+        raise ValueError(f"Empty time window [{start}, {end})")
+    receivers = range(len(recorder.run_starts)) if receivers is None else receivers
+    bin_size = max(1.0, (end - start) / width_px)
+
+    fig = Figure(figsize=(width_px / dpi, 2.2 * len(receivers) + 0.6), dpi=dpi)
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(len(receivers), 1, sharex=True, squeeze=False)[:, 0]
+    for ax, i in zip(axes, receivers):
+        run_starts, run_ends, run_states = _window_runs(recorder, i, start, end)
+        for state, name in enumerate(STATE_NAMES):
+            mask = run_states == state
+            ax.broken_barh(
+                decimate_runs(run_starts[mask], run_ends[mask], start, bin_size),
+                (state - 0.4, 0.8),
+                facecolors=STATE_COLORS[state],
+            )
+        recv = np.frombuffer(recorder.recv_timesteps[i], dtype=np.int64)
+        recv = recv[np.searchsorted(recv, start) : np.searchsorted(recv, end)]
+        # 同一像素内的多个接收事件只画一条
+        pixels = np.unique(np.floor((recv - start) / bin_size))
+        ax.vlines(start + pixels * bin_size, RECV_ROW - 0.4, RECV_ROW + 0.4, colors=RECV_COLOR)
+
+        ax.set_yticks(range(RECV_ROW + 1), STATE_NAMES + ("RECVED",))
+        ax.set_ylim(-0.6, RECV_ROW + 0.6)
+        ax.set_xlim(start, end)
+        ax.set_title(f"Receiver {i} State Sequence over Time", fontsize=10)
+        ax.grid(True, axis="x")
+    axes[-1].set_xlabel("Timestep (ms)")
+    fig.tight_layout()
+    fig.savefig(filename)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Render receiver timelines from a simulator checkpoint"
+    )
+    parser.add_argument("checkpoint")
+    parser.add_argument("--output", default="timeline.png", help=".png or .svg")
+    parser.add_argument("--start", type=int, default=0)
+    parser.add_argument("--end", type=int, default=None)
+    parser.add_argument("--width", type=int, default=1600, help="width in pixels")
+    args = parser.parse_args(argv)
+
+    from Simulator import Simulator
+
+    sim = Simulator.load_checkpoint(args.checkpoint)
+    render_timeline(
+        sim.recorder, args.output, start=args.start, end=args.end, width_px=args.width
+    )
+    print(f"Timeline written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
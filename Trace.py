@@ -0,0 +1,265 @@
+import argparse
+import csv
+import math
+import mmap
+import struct
+import sys
+from bisect import bisect_right
+import numpy as np
+
+# 二进制抓包轨迹：32字节文件头 + 按时间步排序的定长记录
+# 与Tracer.py的事件转储（NPGTRACE）区分开
+TRACE_MAGIC = b"NPGARRV\0"
+TRACE_VERSION = 1
+# 魔数, 版本, 信道数, 发送者数, 保留, 记录数
+HEADER = struct.Struct("<8sIIIIQ")
+RECORD_DTYPE = np.dtype([("timestep", "<i8"), ("channel", "<u4"), ("sender", "<u4")])
+# 发送者名称及其首次出现的信道，与轨迹文件同名加后缀
+SENDERS_SUFFIX = ".senders.csv"
+
+
+def read_header(filename) -> dict:
+    with open(filename, "rb") as f:
+        magic, version, num_channels, num_senders, _, num_records = HEADER.unpack(
+            f.read(HEADER.size)
+        )
+    if magic != TRACE_MAGIC or version != TRACE_VERSION:
+        raise ValueError(f"{filename} is not a version {TRACE_VERSION} trace file")
+    return {
+        "num_channels": num_channels,
+        "num_senders": num_senders,
+        "num_records": num_records,
+    }
+
+
+def convert_text(
+    src,
+    dst,
+    columns=(0, 1, 2),
+    delimiter=None,
+    time_scale=1.0,
+    rebase=True,
+    chunk_records=1 << 16,
+) -> dict:
+    """
+    把文本抓包记录（CSV或空白分隔，如tshark导出的字段）转换成二进制轨迹，逐块写出，内存占用与文件大小无关
+    columns为(时间, 信道, 发送者)所在列，时间乘time_scale换算成毫秒，rebase时以第一条记录为0时刻
+    发送者可以是任意字符串（如MAC地址），按首次出现顺序编号，名称写入dst+SENDERS_SUFFIX
+    输入必须按时间排序；以#开头的行和首行表头被跳过
+    """
+    t_col, ch_col, s_col = columns
+    sender_ids: dict[str, int] = {}
+    first_channels: list[int] = []
+    buf = np.empty(chunk_records, dtype=RECORD_DTYPE)
+    n = 0
+    num_records = 0
+    num_channels = 0
+    origin = None
+    last = None
+    with open(src, newline="", encoding="utf-8") as fin, open(dst, "wb") as fout:
+        fout.write(b"\0" * HEADER.size)  # 文件头最后补写
+        for line_no, line in enumerate(fin, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            fields = (
+                next(csv.reader([line], delimiter=delimiter))
+                if delimiter
+                else line.replace(",", " ").split()
+            )
+            try:
+                t = float(fields[t_col]) * time_scale
+                channel = int(fields[ch_col])
+                name = fields[s_col].strip()
+            except (ValueError, IndexError):
+                if num_records == 0 and n == 0:
+                    continue  # 表头
+                raise ValueError(f"{src}:{line_no}: cannot parse {line!r}")
+            if origin is None:
+                origin = t if rebase else 0.0
+            # 换算成毫秒后取整，容忍如0.201*1000的浮点误差
+            timestep = math.floor(t - origin + 1e-6)
+            if timestep < 0 or (last is not None and timestep < last):
+                raise ValueError(f"{src}:{line_no}: trace is not sorted by time")
+            last = timestep
+            sender = sender_ids.get(name)
+            if sender is None:
+                sender = sender_ids[name] = len(sender_ids)
+                first_channels.append(channel)
+            buf[n] = (timestep, channel, sender)
+            n += 1
+            num_channels = max(num_channels, channel + 1)
+            if n == chunk_records:
+                buf.tofile(fout)
+                num_records += n
+                n = 0
+        buf[:n].tofile(fout)
+        num_records += n
+        fout.seek(0)
+        fout.write(
+            HEADER.pack(
+                TRACE_MAGIC, TRACE_VERSION, num_channels, len(sender_ids), 0, num_records
+            )
+        )
+    with open(dst + SENDERS_SUFFIX, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["sender", "channel"])
+        writer.writerows(zip(sender_ids, first_channels))
+    return read_header(dst)
+
+
+class TraceReplay:
+    """
+    用mmap按块读取二进制轨迹，接口与Traffic.TrafficGenerator相同，
+    pop_due返回(发送者编号, 信道)列表；读过的页随即释放，内存占用与轨迹长度无关
+    """
+
+    def __init__(self, filename, chunk_records=1 << 16):
+        self.filename = filename
+        self.chunk_records = chunk_records
+        header = read_header(filename)
+        self.num_channels = header["num_channels"]
+        self.num_senders = header["num_senders"]
+        self.num_records = header["num_records"]
+        self.sender_names: list[str] = []
+        self.first_channels: list[int] = []
+        with open(filename + SENDERS_SUFFIX, newline="", encoding="utf-8") as f:
+            for row in list(csv.reader(f))[1:]:
+                self.sender_names.append(row[0])
+                self.first_channels.append(int(row[1]))
+        self._open()
+        # 已读到的记录位置，以及当前块
+        self._next_record = 0
+        self._times: list[int] = []
+        self._records: list[tuple[int, int]] = []
+        self._pos = 0
+
+    def _open(self):
+        self._map = None
+        if self.num_records:
+            with open(self.filename, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(self._map, "madvise"):  # Windows上没有madvise
+                self._map.madvise(mmap.MADV_SEQUENTIAL)
+
+    def _read(self, start, count) -> np.ndarray:
+        return np.frombuffer(
+            self._map,
+            dtype=RECORD_DTYPE,
+            count=count,
+            offset=HEADER.size + start * RECORD_DTYPE.itemsize,
+        )
+
+    @property
+    def end_timestep(self) -> int:
+        # 最后一条记录之后的时间步，回放到这里即可结束
+        if not self.num_records:
+            return 0
+        return int(self._read(self.num_records - 1, 1)["timestep"][0]) + 1
+
+    def _load_chunk(self) -> bool:
+        start = self._next_record
+        if start >= self.num_records:
+            return False
+        chunk = self._read(start, min(self.chunk_records, self.num_records - start))
+        self._next_record = start + len(chunk)
+        self._times = chunk["timestep"].tolist()
+        self._records = list(zip(chunk["sender"].tolist(), chunk["channel"].tolist()))
+        del chunk
+        self._pos = 0
+        if hasattr(self._map, "madvise"):
+            # 释放已经转成列表的页（只读映射，之后再访问会从文件重新读入）
+            done = (HEADER.size + start * RECORD_DTYPE.itemsize) // mmap.PAGESIZE
+            if done:
+                self._map.madvise(mmap.MADV_DONTNEED, 0, done * mmap.PAGESIZE)
+        return True
+
+    def next_timestep(self):
+        while self._pos >= len(self._times):
+            if not self._load_chunk():
+                return float("inf")
+        return self._times[self._pos]
+
+    def pop_due(self, timestep) -> list[tuple[int, int]]:
+        due = []
+        # 同一时间步的记录可能跨块
+        while self.next_timestep() == timestep:
+            end = bisect_right(self._times, timestep, self._pos)
+            due.extend(self._records[self._pos : end])
+            self._pos = end
+        return due
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_map"]  # 检查点只保存读取位置，恢复时重新映射文件
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert and replay packet traces")
+    sub = parser.add_subparsers(dest="command", required=True)
+    conv = sub.add_parser("convert", help="text dump -> binary trace")
+    conv.add_argument("src")
+    conv.add_argument("dst")
+    conv.add_argument(
+        "--columns",
+        default="0,1,2",
+        help="column indexes of time, channel and sender",
+    )
+    conv.add_argument("--delimiter", default=None, help="default: comma or whitespace")
+    conv.add_argument(
+        "--time-scale",
+        type=float,
+        default=1.0,
+        help="multiplier to milliseconds, e.g. 1000 for seconds",
+    )
+    conv.add_argument("--no-rebase", action="store_true", help="keep absolute times")
+    info = sub.add_parser("info", help="print trace header")
+    info.add_argument("trace")
+    replay = sub.add_parser("replay", help="run receivers against a trace")
+    replay.add_argument("trace")
+    replay.add_argument("--mode", default=None, help="simulation mode")
+    replay.add_argument("--receivers", type=int, default=2)
+    replay.add_argument("--channels", type=int, default=40)
+    replay.add_argument("--engine", choices=["EVENT", "TICK"], default="EVENT")
+    replay.add_argument("--output", default=None, help="append result row to CSV")
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        header = convert_text(
+            args.src,
+            args.dst,
+            columns=tuple(int(c) for c in args.columns.split(",")),
+            delimiter=args.delimiter,
+            time_scale=args.time_scale,
+            rebase=not args.no_rebase,
+        )
+        print(f"Trace written to {args.dst}: {header}")
+    elif args.command == "info":
+        header = read_header(args.trace)
+        header["end_timestep"] = TraceReplay(args.trace).end_timestep
+        print(header)
+    else:
+        import Simulator
+
+        Simulator.SIM_ENGINE = args.engine
+        sim = Simulator.Simulator(
+            record_mode="OFF",
+            sim_mode=args.mode,
+            num_channels=args.channels,
+            num_receivers=args.receivers,
+            trace=args.trace,
+        )
+        sim.run(step_limit=sim.traffic.end_timestep)
+        if args.output:
+            sim.append_results_to_csv(args.output)
+        sim.summary()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
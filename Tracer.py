@@ -0,0 +1,185 @@
+import json
+import struct
+from array import array
+
+
+class TraceLevel:
+    OFF = 0
+    INFO = 1  # 收发包、丢包、状态切换完成
+    DEBUG = 2  # 逐时间步的细节，如切换中、发送者关闭
+
+
+class TraceEvent:
+    # 事件码
+    SENDER_CREATED = 0
+    SEND = 1
+    SENDER_CLOSED = 2
+    SWITCHING = 3
+    SWITCHED = 4
+    SWITCHING_TO_SCHEDULE = 5
+    SWITCHED_TO_SCHEDULE = 6
+    SCHEDULE_RECV = 7
+    SCHEDULE_DONE = 8
+    SCHEDULE_TIMEOUT = 9
+    RECV = 10
+    DWELL_END = 11
+    LOST = 12
+
+
+# 事件码 -> (类别, 级别, 名称, 输出格式)
+EVENT_TABLE = (
+    ("SENDER", TraceLevel.DEBUG, "SENDER_CREATED", "Sender {sender}: Created in channel {channel}"),
+    ("SENDER", TraceLevel.INFO, "SEND", "Sender {sender}: Send 1 Packet to channel {channel}"),
+    ("SENDER", TraceLevel.DEBUG, "SENDER_CLOSED", "Sender {sender}: closed"),
+    ("RECEIVER", TraceLevel.DEBUG, "SWITCHING", "Receiver {receiver}: Switching to polling channel"),
+    ("RECEIVER", TraceLevel.INFO, "SWITCHED", "Receiver {receiver}: Switched to channel {channel}"),
+    ("RECEIVER", TraceLevel.DEBUG, "SWITCHING_TO_SCHEDULE", "Receiver {receiver}: Switching to scheduled channel..."),
+    ("RECEIVER", TraceLevel.INFO, "SWITCHED_TO_SCHEDULE", "Receiver {receiver}: Switched to scheduled channel {channel}"),
+    ("RECEIVER", TraceLevel.INFO, "SCHEDULE_RECV", "Receiver {receiver}: (Scheduled) Received Packet {sender} from channel {channel}"),
+    ("RECEIVER", TraceLevel.DEBUG, "SCHEDULE_DONE", "Receiver {receiver}: Schedule Received, switching to dwell state"),
+    ("RECEIVER", TraceLevel.INFO, "SCHEDULE_TIMEOUT", "Receiver {receiver}: Schedule timeout, switching to dwell state"),
+    ("RECEIVER", TraceLevel.INFO, "RECV", "Receiver {receiver}: Received Packet {sender} from channel {channel}"),
+    ("RECEIVER", TraceLevel.INFO, "DWELL_END", "Receiver {receiver}: Dwell time ended, switching to next channel {channel}"),
+    ("CHANNEL", TraceLevel.INFO, "LOST", "Channel {channel}: Lost packet of sender {sender}"),
+)
+
+TRACE_MAGIC = b"NPGTRACE"
+TRACE_RECORD = struct.Struct("<qiiiB")  # timestep, receiver, channel, sender, code
+
+
+class Tracer:
+    """
+    结构化事件跟踪，事件写入固定容量的环形缓冲区，满了覆盖最旧的事件
+    调用方先检查tracer.enabled，关闭时不产生任何格式化开销
+    """
+
+    def __init__(self, capacity=1 << 16):
+        self.enabled = False
+        self.level = TraceLevel.OFF
+        self.categories = None
+        self.receivers = None
+        self.channels = None
+        self.echo = False
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        self.capacity = capacity
+        self.timesteps = array("q", bytes(8 * capacity))
+        self.receiver_ids = array("i", bytes(4 * capacity))
+        self.channel_ids = array("i", bytes(4 * capacity))
+        self.sender_ids = array("i", bytes(4 * capacity))
+        self.codes = array("B", bytes(capacity))
+        self._next = 0
+        self.count = 0
+
+    def configure(
+        self,
+        level=TraceLevel.INFO,
+        categories=None,
+        receivers=None,
+        channels=None,
+        capacity=None,
+        echo=False,
+    ):
+        """
+        categories/receivers/channels为None表示不过滤，否则只记录集合内的事件
+        （按接收机或信道过滤时，不带该字段的事件不记录）
+        """
+        self.level = level
+        self.categories = None if categories is None else set(categories)
+        self.receivers = None if receivers is None else set(receivers)
+        self.channels = None if channels is None else set(channels)
+        self.echo = echo
+        if capacity is not None and capacity != self.capacity:
+            self._alloc(capacity)
+        self.enabled = level > TraceLevel.OFF
+
+    def disable(self):
+        self.enabled = False
+        self.level = TraceLevel.OFF
+
+    def clear(self):
+        self._next = 0
+        self.count = 0
+
+    def emit(self, timestep, code, receiver=-1, channel=-1, sender=-1):
+        category, level, _, _ = EVENT_TABLE[code]
+        if level > self.level:
+            return
+        if self.categories is not None and category not in self.categories:
+            return
+        if self.receivers is not None and receiver not in self.receivers:
+            return
+        if self.channels is not None and channel not in self.channels:
+            return
+        i = self._next
+        self.timesteps[i] = timestep
+        self.receiver_ids[i] = receiver
+        self.channel_ids[i] = channel
+        self.sender_ids[i] = sender
+        self.codes[i] = code
+        self._next = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        if self.echo:
+            print(format_event(timestep, code, receiver, channel, sender))
+
+    def events(self):
+        # 按时间顺序返回(timestep, code, receiver, channel, sender)
+        start = (self._next - self.count) % self.capacity
+        for k in range(self.count):
+            i = (start + k) % self.capacity
+            yield (
+                self.timesteps[i],
+                self.codes[i],
+                self.receiver_ids[i],
+                self.channel_ids[i],
+                self.sender_ids[i],
+            )
+
+    def dump(self, filename):
+        # .jsonl按行输出JSON，其余按二进制记录输出
+        if filename.endswith(".jsonl"):
+            with open(filename, "w", encoding="utf-8") as f:
+                for timestep, code, receiver, channel, sender in self.events():
+                    f.write(
+                        json.dumps(
+                            {
+                                "timestep": timestep,
+                                "event": EVENT_TABLE[code][2],
+                                "receiver": receiver,
+                                "channel": channel,
+                                "sender": sender,
+                            }
+                        )
+                        + "\n"
+                    )
+        else:
+            with open(filename, "wb") as f:
+                f.write(TRACE_MAGIC + struct.pack("<Q", self.count))
+                for timestep, code, receiver, channel, sender in self.events():
+                    f.write(TRACE_RECORD.pack(timestep, receiver, channel, sender, code))
+
+
+def format_event(timestep, code, receiver=-1, channel=-1, sender=-1) -> str:
+    text = EVENT_TABLE[code][3].format(receiver=receiver, channel=channel, sender=sender)
+    return f"[{timestep}] {text}"
+
+
+def read_trace(filename):
+    """
+    读取Tracer.dump输出的二进制文件，返回(timestep, code, receiver, channel, sender)
+    """
+    with open(filename, "rb") as f:
+        if f.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+            raise ValueError(f"{filename} is not a trace file")
+        (count,) = struct.unpack("<Q", f.read(8))
+        for _ in range(count):
+            timestep, receiver, channel, sender, code = TRACE_RECORD.unpack(
+                f.read(TRACE_RECORD.size)
+            )
+            yield (timestep, code, receiver, channel, sender)
+
+
+# 全局跟踪器
+tracer = Tracer()
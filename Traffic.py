@@ -0,0 +1,215 @@
+from bisect import bisect_right
+import numpy as np
+
+# 流量模型注册表：模型名 -> 模型类
+TRAFFIC_MODELS = {}
+
+
+def register_traffic_model(cls):
+    TRAFFIC_MODELS[cls.name] = cls
+    return cls
+
+
+class TrafficModel:
+    """
+    流量模型，给出各发送者的发送间隔（毫秒，可以是小数）
+    period为各发送者的名义周期，与Sender一致取interval+1（间隔超过interval才发送）
+    """
+
+    name = ""
+
+    def __init__(self, period: np.ndarray, rng: np.random.Generator):
+        self.period = period
+        self.rng = rng
+
+    def intervals(self, idx: np.ndarray, t: np.ndarray, k: int) -> np.ndarray:
+        # idx: 发送者编号，t: 这些发送者本次的发送时间，返回之后k次发送的间隔，形状为(len(idx), k)
+        raise NotImplementedError
+
+    def next_interval(self, idx: np.ndarray, t: np.ndarray) -> np.ndarray:
+        return self.intervals(idx, t, 1)[:, 0]
+
+    def schedule(self, idx, t, end) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        生成idx中各发送者从t（含）到end之前的全部发送时刻，返回(发送时刻, 发送者编号, 下一次发送时刻)
+        每轮按名义周期估计窗口内的发送次数，一次生成所有间隔再累加，间隔随机偏短的发送者下一轮补齐
+        """
+        times, ids = [], []
+        next_t = t.copy()
+        rows = np.arange(len(idx))
+        while len(rows):
+            t0 = next_t[rows]
+            k = int(np.ceil(((end - t0) / self.period[idx[rows]]).max())) + 1
+            # 间隔至少1毫秒，保证同一发送者取整后的发送时间步严格递增
+            steps = np.maximum(self.intervals(idx[rows], t0, k), 1.0)
+            # 逐个累加（cumsum按顺序相加），与逐次t+间隔的浮点结果相同
+            cum = np.cumsum(np.concatenate([t0[:, None], steps], axis=1), axis=1)
+            sends = cum[:, :k]
+            mask = sends < end
+            times.append(sends[mask])
+            ids.append(np.broadcast_to(idx[rows, None], sends.shape)[mask])
+            next_t[rows] = cum[np.arange(len(rows)), mask.sum(axis=1)]
+            rows = rows[next_t[rows] < end]
+        return np.concatenate(times), np.concatenate(ids), next_t
+
+
+@register_traffic_model
+class PeriodicModel(TrafficModel):
+    # 固定周期，与原先Sender逐毫秒判断的发送时刻完全相同
+    name = "PERIODIC"
+
+    def intervals(self, idx, t, k):
+        return np.repeat(self.period[idx, None], k, axis=1)
+
+
+@register_traffic_model
+class JitterModel(TrafficModel):
+    # 周期加正态抖动，jitter为标准差（毫秒）
+    name = "JITTER"
+
+    def __init__(self, period, rng, jitter=5.0):
+        super().__init__(period, rng)
+        self.jitter = jitter
+
+    def intervals(self, idx, t, k):
+        return self.period[idx, None] + self.rng.normal(0.0, self.jitter, (len(idx), k))
+
+
+@register_traffic_model
+class PoissonModel(TrafficModel):
+    # 泊松到达，平均间隔为名义周期
+    name = "POISSON"
+
+    def intervals(self, idx, t, k):
+        return self.rng.exponential(self.period[idx, None], (len(idx), k))
+
+
+@register_traffic_model
+class BurstyModel(TrafficModel):
+    """
+    开关突发：开启期内每burst_interval毫秒发送一次，开启、关闭时长服从
+    平均值为on_time、off_time的指数分布
+    """
+
+    name = "BURSTY"
+
+    def __init__(self, period, rng, burst_interval=20.0, on_time=1000.0, off_time=4000.0):
+        super().__init__(period, rng)
+        self.burst_interval = max(burst_interval, 1.0)
+        self.on_time = on_time
+        self.off_time = off_time
+        self.on_end = rng.exponential(on_time, len(period))
+
+    def _next_period(self, rows, last):
+        # rows的开启期结束，跳过一个关闭期，返回新开启期的第一次发送时刻
+        start = np.maximum(
+            self.on_end[rows] + self.rng.exponential(self.off_time, len(rows)), last + 1
+        )
+        self.on_end[rows] = start + self.rng.exponential(self.on_time, len(rows))
+        return start
+
+    def next_interval(self, idx, t):
+        nxt = t + self.burst_interval
+        off = nxt >= self.on_end[idx]
+        if off.any():
+            nxt[off] = self._next_period(idx[off], t[off])
+        return nxt - t
+
+    def schedule(self, idx, t, end):
+        # 发送时刻取决于开启期状态，按开启期推进：每轮一次生成各发送者本开启期内的全部发送
+        times, ids = [], []
+        next_t = t.copy()
+        rows = np.arange(len(idx))
+        b = self.burst_interval
+        while len(rows):
+            t0 = next_t[rows]
+            on_end = self.on_end[idx[rows]]
+            # 本开启期内的发送次数，以及其中落在窗口内的次数
+            in_period = np.ceil((on_end - t0) / b).astype(np.int64)
+            count = np.minimum(in_period, np.ceil((end - t0) / b).astype(np.int64))
+            offsets = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+            times.append(np.repeat(t0, count) + offsets * b)
+            ids.append(np.repeat(idx[rows], count))
+            last = t0 + (count - 1) * b
+            done = count < in_period  # 窗口先于开启期结束
+            next_t[rows[done]] = last[done] + b
+            ended = rows[~done]
+            if len(ended):
+                next_t[ended] = self._next_period(idx[ended], last[~done])
+            rows = rows[next_t[rows] < end]
+        return np.concatenate(times), np.concatenate(ids), next_t
+
+
+@register_traffic_model
+class DriftModel(TrafficModel):
+    # 每个发送者的时钟有固定频偏，标准差为drift_ppm（百万分之一）
+    name = "DRIFT"
+
+    def __init__(self, period, rng, drift_ppm=2000.0):
+        super().__init__(period, rng)
+        self.skew = rng.normal(0.0, drift_ppm * 1e-6, len(period))
+
+    def intervals(self, idx, t, k):
+        return np.repeat((self.period[idx] * (1.0 + self.skew[idx]))[:, None], k, axis=1)
+
+
+class TrafficGenerator:
+    """
+    按时间窗口分块预先计算所有发送者的发送时刻，合并成按(时间步, 发送者编号)排序的到达流，
+    引擎只需处理有包要发的发送者
+    """
+
+    def __init__(self, senders, model="PERIODIC", rng=None, options=None, chunk_events=1 << 16):
+        if model not in TRAFFIC_MODELS:
+            raise ValueError(f"Unknown traffic model {model}")
+        rng = np.random.default_rng() if rng is None else rng
+        period = np.array([s.interval + 1 for s in senders], dtype=np.float64)
+        self.model = TRAFFIC_MODELS[model](period, rng, **(options or {}))
+        idx = np.arange(len(senders))
+        last = np.array([s.last_timestep for s in senders], dtype=np.float64)
+        # 首次发送时间：起始相位之后一个间隔；未使能的发送者永不发送
+        self.next_time = last + self.model.next_interval(idx, last)
+        self.next_time[[not s.en for s in senders]] = np.inf
+        # 窗口从1秒开始逐次加倍，直到平均约chunk_events个发送事件，短的运行不会多生成太多；
+        # 窗口边界与运行怎样分段无关，分段运行、从检查点恢复与一次运行完的结果相同
+        mean_period = period.mean() if len(period) else 1.0
+        self.max_window = max(1000, int(chunk_events * mean_period / max(1, len(senders))))
+        self.window = 1000
+        self.filled_until = 0
+        self._times: list[int] = []
+        self._ids: list[int] = []
+        self._pos = 0
+
+    def _fill(self):
+        end = self.filled_until + self.window
+        self.window = min(self.window * 2, self.max_window)
+        idx = np.flatnonzero(self.next_time < end)
+        self.filled_until = end
+        if len(idx):
+            times, ids, self.next_time[idx] = self.model.schedule(
+                idx, self.next_time[idx], end
+            )
+            times = np.floor(times).astype(np.int64)
+            order = np.lexsort((ids, times))
+            self._times = times[order].tolist()
+            self._ids = ids[order].tolist()
+        else:
+            self._times, self._ids = [], []
+        self._pos = 0
+
+    def next_timestep(self):
+        # 下一次发送的时间步，不再有发送时返回inf
+        while self._pos >= len(self._times):
+            if not np.isfinite(self.next_time).any():
+                return float("inf")
+            self._fill()
+        return self._times[self._pos]
+
+    def pop_due(self, timestep) -> list[int]:
+        # 取出timestep时刻要发送的发送者编号（升序）
+        if self.next_timestep() != timestep:
+            return []
+        end = bisect_right(self._times, timestep, self._pos)
+        ids = self._ids[self._pos : end]
+        self._pos = end
+        return ids
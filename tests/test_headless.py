@@ -0,0 +1,16 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Headless
+
+
+def test_cold_import_within_budget():
+    elapsed, _ = Headless.measure_imports()
+    assert elapsed <= Headless.IMPORT_BUDGET_MS, f"cold import took {elapsed:.1f}ms"
+
+
+def test_heavy_modules_not_imported():
+    _, loaded = Headless.measure_imports(repeat=1)
+    assert not loaded, f"imported eagerly: {loaded}"
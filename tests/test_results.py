@@ -0,0 +1,18 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Results
+from Simulator import Simulator
+
+
+def test_back_to_back_writers_keep_every_run(tmp_path):
+    sim = Simulator(num_senders=3, seed=1, record_mode="OFF")
+    sim.run(step_limit=2000, progress=False)
+    tables = Results.collect_tables(sim)
+    directory = str(tmp_path / "results")
+    run_ids = [Results.ResultWriter(directory, "csv").write(tables) for _ in range(5)]
+    runs = Results.load_table(directory, "runs")
+    assert len(runs["run_id"]) == 5
+    assert sorted(runs["run_id"]) == sorted(run_ids)